@@ -0,0 +1,245 @@
+# Batch portfolio evaluation: one summary row per candidate site
+#
+#   python batch_feasibility.py sites.csv summary.csv --workers 8
+#   python batch_feasibility.py sites.csv summary.csv --store feasibility.db
+#
+# Each input row is a project with land_price, land_lvr, soft_costs and
+# (optionally) interest_rate, plus either a ``units`` column holding a JSON
+# list of unit dicts or a ``units_file`` column naming a CSV of units
+# (relative paths resolve against the input file's folder). With --store,
+# metrics are looked up by input hash in the project store first and new
+# results are written back, so re-running an edited portfolio only computes
+# the rows that changed. --drawdown and --equity-first apply to every row.
+# --discount-rate adds IRR, NPV, equity multiple and payback columns.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from drawdown import DRAWDOWN_PROFILES
+from feasibility import UNIT_FIELDS, run_feasibility
+from export import table_chunks, write_chunks
+from goal_seek import residual_land_value
+from project_store import ProjectStore, scenario_hash
+from returns import RETURN_METRICS, project_returns
+
+DEFAULT_INTEREST_RATE = 0.065
+SUMMARY_COLUMNS = [
+    "total_revenue", "interest_cost", "full_cost", "total_project_cost", "peak_cash",
+    "roi_total", "roi_cash", "grade",
+]
+
+
+def read_table(path):
+    import pandas as pd
+
+    if path.lower().endswith((".parquet", ".pq")):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=256)
+def load_units_file(path):
+    """Unit list from a CSV with UNIT_FIELDS columns (cached per worker)."""
+    df = read_table(path)
+    if "label" not in df.columns:
+        df["label"] = [f"Unit {i + 1}" for i in range(len(df))]
+    return tuple(
+        {k: (int(row[k]) if k in ("start", "duration") else row[k]) for k in UNIT_FIELDS}
+        for row in df.to_dict("records")
+    )
+
+
+def project_units(row, base_dir):
+    units = row.get("units")
+    if isinstance(units, str) and units.strip():
+        return json.loads(units)
+    ref = row.get("units_file")
+    if isinstance(ref, str) and ref.strip():
+        return list(load_units_file(os.path.join(base_dir, ref)))
+    raise ValueError("Row has neither 'units' nor 'units_file'")
+
+
+def row_project(row, base_dir, options=None):
+    """Engine inputs for one project row, with portfolio-wide ``options`` merged in."""
+    rate = row.get("interest_rate")
+    return {
+        **(options or {}),
+        "land_price": float(row["land_price"]),
+        "land_lvr": float(row["land_lvr"]),
+        "soft_costs": float(row["soft_costs"]),
+        "interest_rate": DEFAULT_INTEREST_RATE if rate is None or rate != rate else float(rate),
+        "units": project_units(row, base_dir),
+    }
+
+
+def evaluate_row(row, base_dir, known=None, options=None):
+    """Engine inputs and summary metrics for one project row.
+
+    ``known`` maps input hashes to stored metrics; matching rows reuse them
+    and newly computed metrics are added to it. Failures are reported in the
+    summary's 'error' field, not raised.
+    """
+    try:
+        project = row_project(row, base_dir, options)
+        key = scenario_hash(project) if known is not None else None
+        metrics = known.get(key) if known is not None else None
+        if metrics is None:
+            metrics = run_feasibility(
+                project["land_price"], project["land_lvr"], project["soft_costs"],
+                project["interest_rate"], project["units"], **(options or {}),
+            )["metrics"]
+            if known is not None:
+                known[key] = metrics
+    except Exception as exc:  # one bad listing must not sink the batch
+        return None, {"error": f"{type(exc).__name__}: {exc}"}
+    return project, {**{k: metrics[k] for k in SUMMARY_COLUMNS}, "error": ""}
+
+
+def stored_metrics(store, rows, base_dir, options=None):
+    """Metrics already in ``store`` for any of ``rows``, keyed by input hash."""
+    keys = []
+    for row in rows:
+        try:
+            keys.append(scenario_hash(row_project(row, base_dir, options)))
+        except Exception:
+            continue  # reported when the row is evaluated
+    return store.get_metrics(keys)
+
+
+def evaluate_chunk(rows, base_dir, residual_target=None, store_path=None, options=None, discount_rate=None):
+    """Summaries for a chunk; residual land values and returns are solved for the chunk at once.
+
+    With ``store_path``, stored results are reused and new ones are written
+    back in one transaction per chunk. ``options`` (drawdown, equity_first)
+    are passed to every run. With ``discount_rate``, RETURN_METRICS are added.
+    """
+    known = None
+    if store_path is not None:
+        store = ProjectStore(store_path)
+        known = stored_metrics(store, rows, base_dir, options)
+        reused = set(known)
+    evaluated = [evaluate_row(row, base_dir, known, options) for row in rows]
+    if known is not None:
+        store.put_results([(key, m, None) for key, m in known.items() if key not in reused])
+    if residual_target is not None:
+        ok = [i for i, (project, _) in enumerate(evaluated) if project is not None]
+        values = residual_land_value([evaluated[i][0] for i in ok], residual_target, **(options or {}))
+        for i, value in zip(ok, values):
+            evaluated[i][1]["residual_land_value"] = float(value)
+    if discount_rate is not None:
+        ok = [i for i, (project, _) in enumerate(evaluated) if project is not None]
+        returns = project_returns([evaluated[i][0] for i in ok], discount_rate, **(options or {}))
+        for j, i in enumerate(ok):
+            evaluated[i][1].update({k: float(returns[k][j]) for k in RETURN_METRICS})
+    return [summary for _, summary in evaluated]
+
+
+def evaluate_portfolio(rows, base_dir=".", workers=None, chunk_size=500, progress=None,
+                       residual_target=None, store_path=None, options=None, discount_rate=None):
+    """Evaluate project rows across a process pool, preserving input order.
+
+    With ``residual_target`` (cash-on-cash ROI %), each summary also carries
+    the residual land value that meets it. With ``discount_rate`` (annual),
+    it carries RETURN_METRICS. With ``store_path``, results are shared
+    through the project store at that path.
+    """
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    results = [None] * len(chunks)
+    done = 0
+    if workers == 1:
+        for i, chunk in enumerate(chunks):
+            results[i] = evaluate_chunk(chunk, base_dir, residual_target, store_path, options, discount_rate)
+            done += len(chunk)
+            if progress:
+                progress(done, len(rows))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(evaluate_chunk, chunk, base_dir, residual_target, store_path, options, discount_rate): i
+                for i, chunk in enumerate(chunks)
+            }
+            for fut in as_completed(futures):
+                i = futures[fut]
+                results[i] = fut.result()
+                done += len(chunks[i])
+                if progress:
+                    progress(done, len(rows))
+    return [summary for chunk in results for summary in chunk]
+
+
+def run_options(args):
+    """Model options from the command line."""
+    return {"drawdown": args.drawdown, "equity_first": args.equity_first}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a portfolio of candidate sites.")
+    parser.add_argument("input", help="CSV or Parquet file of projects")
+    parser.add_argument("output", help="CSV, Parquet or Excel (.xlsx) file for the summary table")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="projects per scheduled task")
+    parser.add_argument("--residual-target", type=float, metavar="ROI",
+                        help="also solve the residual land value for this cash-on-cash ROI (%%)")
+    parser.add_argument("--store", metavar="DB", help="reuse and save results in this project store")
+    parser.add_argument("--drawdown", choices=DRAWDOWN_PROFILES, default="flat",
+                        help="construction drawdown profile for every project")
+    parser.add_argument("--equity-first", type=float, metavar="AMOUNT",
+                        help="fund this much construction from equity before the loan (default: 30/70 pro rata)")
+    parser.add_argument("--discount-rate", type=float, metavar="RATE",
+                        help="also report IRR, NPV at this annual rate (e.g. 0.10), equity multiple and payback")
+    parser.add_argument("--quiet", action="store_true", help="suppress progress output")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    sites = read_table(args.input)
+    rows = sites.to_dict("records")
+    started = time.perf_counter()
+
+    def report(done, total):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        print(f"\r{done:,}/{total:,} projects ({rate:,.0f}/s)", end="", file=sys.stderr, flush=True)
+
+    summaries = evaluate_portfolio(
+        rows, base_dir=os.path.dirname(os.path.abspath(args.input)),
+        workers=args.workers, chunk_size=args.chunk_size,
+        progress=None if args.quiet else report, residual_target=args.residual_target,
+        store_path=args.store, options=run_options(args), discount_rate=args.discount_rate,
+    )
+    if not args.quiet:
+        print(file=sys.stderr)
+
+    keep = [c for c in sites.columns if c not in ("units", "units_file")]
+    columns = SUMMARY_COLUMNS + (["residual_land_value"] if args.residual_target is not None else [])
+    columns += (list(RETURN_METRICS) if args.discount_rate is not None else []) + ["error"]
+    out = pd.concat([sites[keep].reset_index(drop=True), pd.DataFrame(summaries, columns=columns)], axis=1)
+    record = {
+        "source": os.path.abspath(args.input),
+        "source_sha256": file_sha256(args.input),
+        "residual_target": args.residual_target,
+        "discount_rate": args.discount_rate,
+        **run_options(args),
+    }
+    write_chunks(table_chunks({c: out[c].to_numpy() for c in out.columns}), args.output, record)
+    failed = int((out["error"] != "").sum())
+    if failed:
+        print(f"{failed:,} project(s) failed; see the 'error' column", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# Benchmark and correctness baseline for the feasibility pipeline
+#
+#   python benchmark.py                              # quick profile
+#   python benchmark.py --profile full               # 10k units, 600 months, 1M scenarios
+#   python benchmark.py --compare old.json           # fail on >1.5x slowdowns
+#   python benchmark.py --write-baseline             # regenerate benchmark_baseline.json
+#
+# Each stage the app runs (ledger, DataFrame, metrics, chart, CSV, daily
+# event ledger) is timed on synthetic projects across unit counts and
+# horizons, and the batch engine across scenario counts, with and without
+# IRR/NPV returns. Results go to a JSON file. Before timing, every engine
+# path (single run, incremental ledger, batched scenarios) is checked
+# against benchmark_baseline.json: numbers from the original month-loop
+# model, which the engine reproduces with interest off and no repayment
+# from sales.
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import charts
+from event_ledger import project_events
+from export import export_bytes, ledger_chunks
+from feasibility import (
+    build_ledger, compute_metrics, deal_grade, ledger_frame, run_feasibility, scenario_metrics, stack_units,
+)
+from feasibility_cache import IncrementalLedger
+from sensitivity import evaluate
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+BASELINE_METRICS = ("roi_cash", "total_project_cost", "peak_cash")
+BASELINE_RTOL = 1e-9
+PROFILES = {
+    "quick": {"units": [1, 100, 1_000], "months": [12, 120], "scenarios": [1_000, 100_000]},
+    "full": {
+        "units": [1, 100, 1_000, 10_000], "months": [12, 60, 120, 240, 600],
+        "scenarios": [1_000, 100_000, 1_000_000],
+    },
+}
+STAGES = ("ledger", "frame", "metrics", "chart", "csv", "events", "scenarios", "returns")
+GLOBALS = {"land_price": 1_350_000, "land_lvr": 0.7, "soft_costs": 80_000}
+MIN_REPEAT_SECONDS = 0.2
+MAX_REPEATS = 5
+NOISE_FLOOR = 0.005  # seconds; smaller slowdowns are timer noise
+
+
+# --- Reference Model ---
+def legacy_metrics(land_price, land_lvr, soft_costs, units):
+    """The original app's month-loop model (no interest, fixed 30/70 split)."""
+    cash_months = {0: land_price * (1 - land_lvr) + soft_costs}
+    loan_months = {0: land_price * land_lvr}
+    for u in units:
+        total = u["size"] * u["rate"] * (1 + u["cont"])
+        per_month = total / u["duration"]
+        for m in range(u["start"], u["start"] + u["duration"]):
+            cash_months[m] = cash_months.get(m, 0) + per_month * 0.3
+            loan_months[m] = loan_months.get(m, 0) + per_month * 0.7
+        sale_m = u["start"] + u["duration"] + 1
+        cash_months[sale_m] = cash_months.get(sale_m, 0) - u["sale"]
+
+    cum_cash, cum_loan = [], []
+    cash = loan = 0
+    for m in range(max(max(cash_months), max(loan_months)) + 2):
+        cash += cash_months.get(m, 0)
+        loan += loan_months.get(m, 0)
+        cum_cash.append(cash)
+        cum_loan.append(loan)
+    first_sale = min(u["start"] + u["duration"] + 1 for u in units)
+    total_project_cost = cum_cash[first_sale - 1] + cum_loan[first_sale - 1]
+    gross_profit = sum(u["sale"] for u in units) - total_project_cost
+    peak_cash = max(cum_cash)
+    roi_cash = gross_profit / peak_cash * 100
+    return {
+        "roi_cash": roi_cash, "total_project_cost": total_project_cost, "peak_cash": peak_cash,
+        "grade": deal_grade(roi_cash)[0],
+    }
+
+
+def baseline_cases(n_cases=40, seed=20250301):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(n_cases):
+        units = [
+            {
+                "label": f"Unit {i + 1}", "size": rng.randint(60, 320), "rate": rng.choice([1800, 2000, 2350.5, 2800]),
+                "cont": round(rng.random() * 0.3, 4), "start": rng.randint(0, 36), "duration": rng.randint(1, 24),
+                "sale": rng.randint(400_000, 1_600_000),
+            }
+            for i in range(rng.randint(1, 25))
+        ]
+        cases.append({
+            "land_price": rng.randint(0, 4_000_000), "land_lvr": round(rng.random(), 4),
+            "soft_costs": rng.randint(0, 250_000), "units": units,
+        })
+    return cases
+
+
+def write_baseline(path=BASELINE_PATH):
+    cases = [{**case, "expected": legacy_metrics(**case)} for case in baseline_cases()]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"source": "original month-loop model", "cases": cases}, f, indent=1)
+    return len(cases)
+
+
+def check_baseline(path=BASELINE_PATH):
+    """Compare every engine path with the stored numbers; returns failure strings."""
+    with open(path, encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    failures = []
+
+    def compare(path_name, i, got, expected):
+        for k in BASELINE_METRICS:
+            if not np.isclose(got[k], expected[k], rtol=BASELINE_RTOL, atol=1e-6):
+                failures.append(f"case {i} {path_name} {k}: {got[k]!r} != {expected[k]!r}")
+        if got["grade"] != expected["grade"]:
+            failures.append(f"case {i} {path_name} grade: {got['grade']} != {expected['grade']}")
+
+    for i, case in enumerate(cases):
+        args = (case["land_price"], case["land_lvr"], case["soft_costs"])
+        compare("run_feasibility", i, run_feasibility(*args, 0.0, case["units"], repay_from_sales=False)["metrics"],
+                case["expected"])
+        ledger = IncrementalLedger(case["units"]).ledger(*args, 0.0, repay_from_sales=False)
+        compare("incremental", i, compute_metrics(ledger, case["units"], case["land_price"], case["soft_costs"]),
+                case["expected"])
+
+    # All cases as one padded batch through the scenario engine
+    batch = scenario_metrics(
+        np.array([c["land_price"] for c in cases], dtype=float),
+        np.array([c["land_lvr"] for c in cases], dtype=float),
+        np.array([c["soft_costs"] for c in cases], dtype=float),
+        stack_units([c["units"] for c in cases]), repay_from_sales=False,
+    )
+    for i, case in enumerate(cases):
+        got = {k: float(batch[k][i]) for k in BASELINE_METRICS}
+        got["grade"] = deal_grade(got["roi_cash"])[0]
+        compare("scenario_metrics", i, got, case["expected"])
+    return failures
+
+
+# --- Timing ---
+def synthetic_units(n_units, n_months, seed=0):
+    """Units whose last settlement lands exactly on the horizon's final sale month."""
+    rng = np.random.default_rng(seed)
+    duration = np.minimum(rng.integers(6, 19, n_units), max(n_months - 3, 1))
+    start = (rng.random(n_units) * np.maximum(n_months - 2 - duration - 1, 0) + 0.5).astype(int)
+    start[0] = n_months - 3 - duration[0]
+    return [
+        {"label": f"Lot {i + 1}", "size": float(rng.integers(80, 260)), "rate": 2100.0, "cont": 0.1,
+         "start": int(start[i]), "duration": int(duration[i]), "sale": float(rng.integers(600_000, 1_400_000))}
+        for i in range(n_units)
+    ]
+
+
+def timed(fn):
+    """(median seconds, repeats, last result) over enough repeats to be stable."""
+    times, result = [], None
+    while len(times) < MAX_REPEATS and (not times or sum(times) < MIN_REPEAT_SECONDS):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), len(times), result
+
+
+def stage_cases(profile, stages):
+    rows = []
+    warmed = set()  # first call per stage pays one-off imports (pandas, matplotlib)
+
+    def measure(stage, fn):
+        if stage not in warmed:
+            fn()
+            warmed.add(stage)
+        return timed(fn)
+
+    args = (GLOBALS["land_price"], GLOBALS["land_lvr"], GLOBALS["soft_costs"], 0.065)
+    for n_units in profile["units"]:
+        for n_months in profile["months"]:
+            units = synthetic_units(n_units, n_months)
+            ledger = build_ledger(*args[:3], units, args[3])
+            jobs = {
+                "ledger": lambda: build_ledger(*args[:3], units, args[3]),
+                "frame": lambda: ledger_frame(ledger),
+                "metrics": lambda: compute_metrics(ledger, units, GLOBALS["land_price"], GLOBALS["soft_costs"]),
+                "chart": lambda: (charts._png_cache.clear(), charts.cashflow_png(ledger))[1],
+                "csv": lambda: export_bytes(ledger_chunks(ledger), "csv"),
+                "events": lambda: project_events(GLOBALS["land_price"], GLOBALS["soft_costs"], units)
+                .view(GLOBALS["land_lvr"], args[3], "daily"),
+            }
+            for stage, fn in jobs.items():
+                if stage not in stages:
+                    continue
+                seconds, repeats, _ = measure(stage, fn)
+                rows.append({
+                    "stage": stage, "units": n_units, "months": len(ledger["Month"]), "scenarios": 1,
+                    "rows": len(ledger["Month"]), "seconds": seconds, "repeats": repeats,
+                })
+    base = {**GLOBALS, "interest_rate": 0.065, "units": synthetic_units(10, 60)}
+    for stage, discount_rate in (("scenarios", None), ("returns", 0.10)):
+        if stage not in stages:
+            continue
+        for n_scen in profile["scenarios"]:
+            overrides = {"sale": np.linspace(0.8, 1.2, n_scen), "land_price": np.linspace(1e6, 2e6, n_scen)}
+            seconds, repeats, _ = measure(stage, lambda: evaluate(base, overrides, discount_rate))
+            rows.append({
+                "stage": stage, "units": 10, "months": 60, "scenarios": n_scen,
+                "rows": n_scen, "seconds": seconds, "repeats": repeats,
+            })
+    return rows
+
+
+def regressions(results, previous, max_slowdown):
+    """Cases slower than ``max_slowdown`` times their time in ``previous``."""
+    key = lambda r: (r["stage"], r["units"], r["months"], r["scenarios"])
+    before = {key(r): r["seconds"] for r in previous["results"]}
+    slow = []
+    for r in results:
+        old = before.get(key(r))
+        if old is not None and r["seconds"] > old * max_slowdown and r["seconds"] - old > NOISE_FLOOR:
+            slow.append(f"{r['stage']} units={r['units']} months={r['months']} scenarios={r['scenarios']}: "
+                        f"{old * 1000:.1f} ms -> {r['seconds'] * 1000:.1f} ms")
+    return slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the feasibility pipeline.")
+    parser.add_argument("--profile", choices=PROFILES, default="quick")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results file to check for regressions")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="allowed time ratio against --compare")
+    parser.add_argument("--write-baseline", action="store_true", help="regenerate the correctness baseline and exit")
+    args = parser.parse_args(argv)
+
+    if args.write_baseline:
+        print(f"wrote {write_baseline()} baseline cases to {BASELINE_PATH}")
+        return 0
+
+    failures = check_baseline()
+    print(f"correctness baseline: {'ok' if not failures else f'{len(failures)} mismatch(es)'}")
+    for failure in failures[:20]:
+        print(f"  {failure}")
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    results = []
+    for row in stage_cases(PROFILES[args.profile], stages):
+        results.append(row)
+        print(f"{row['stage']:>9}  units={row['units']:<6} months={row['months']:<4} "
+              f"scenarios={row['scenarios']:<8} {row['seconds'] * 1000:10.2f} ms")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "profile": args.profile,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "baseline_failures": failures,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    slow = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slow = regressions(results, json.load(f), args.max_slowdown)
+        for line in slow:
+            print(f"regression: {line}")
+    return 1 if failures or slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# Cashflow and sensitivity chart rendering
+#
+# Two paths: native chart data (plain arrays and Vega-Lite specs for
+# Streamlit's built-in charts) and static PNGs from matplotlib. matplotlib is
+# only imported when a PNG is actually rendered, and PNGs are cached by a hash
+# of the plotted data. Long series are downsampled per bucket to their min
+# and max points, so peaks and troughs survive exactly.
+
+import hashlib
+import io
+
+import numpy as np
+
+from feasibility_cache import ResultCache
+
+CHART_SERIES = {
+    "Cash Invested": "Cumulative Cash ($)",
+    "Loan": "Loan Balance ($)",
+    "Net Position": "Net Cash Position ($)",
+}
+MAX_POINTS = 600
+MARKER_LIMIT = 120  # draw point markers only for short series
+MAX_TICKS = 24
+
+_png_cache = ResultCache(maxsize=64)
+
+
+def downsample_indices(series, max_points=MAX_POINTS):
+    """Sorted row indices keeping each bucket's min and max of every series.
+
+    The first and last rows are always kept, so the result holds at most
+    ``max_points + 2`` rows and every series' global extremes are exact.
+    """
+    series = [np.asarray(s, dtype=float) for s in series]
+    n = len(series[0])
+    if n <= max_points:
+        return np.arange(n)
+    n_buckets = max(max_points // (2 * len(series)), 1)
+    size = -(-n // n_buckets)
+    keep = [np.array([0, n - 1])]
+    offsets = np.arange(n_buckets) * size
+    for s in series:
+        padded = np.pad(s, (0, n_buckets * size - n), mode="edge").reshape(n_buckets, size)
+        keep.append(np.minimum(offsets + padded.argmin(axis=1), n - 1))
+        keep.append(np.minimum(offsets + padded.argmax(axis=1), n - 1))
+    return np.unique(np.concatenate(keep))
+
+
+def chart_data(ledger, max_points=MAX_POINTS):
+    """Columns for a native line chart: Month plus the downsampled series."""
+    series = {name: np.asarray(ledger[col], dtype=float) for name, col in CHART_SERIES.items()}
+    idx = downsample_indices(list(series.values()), max_points)
+    return {"Month": np.asarray(ledger["Month"])[idx], **{name: s[idx] for name, s in series.items()}}
+
+
+def _cell_edges(values):
+    """Cell boundaries halfway between sweep values, extended half a step at each end."""
+    values = np.asarray(values, dtype=float)
+    if len(values) == 1:
+        return values - 0.5, values + 0.5
+    mid = (values[1:] + values[:-1]) / 2
+    return np.concatenate([[2 * values[0] - mid[0]], mid]), np.concatenate([mid, [2 * values[-1] - mid[-1]]])
+
+
+def heatmap_spec(surface, xs, ys, x_label, y_label, value_label):
+    """(columns, Vega-Lite spec) of a sensitivity surface for a native rect chart."""
+    x_lo, x_hi = _cell_edges(xs)
+    y_lo, y_hi = _cell_edges(ys)
+    ny, nx = np.shape(surface)
+    data = {
+        "x": np.tile(np.asarray(xs, dtype=float), ny), "x_lo": np.tile(x_lo, ny), "x_hi": np.tile(x_hi, ny),
+        "y": np.repeat(np.asarray(ys, dtype=float), nx), "y_lo": np.repeat(y_lo, nx), "y_hi": np.repeat(y_hi, nx),
+        "value": np.asarray(surface, dtype=float).ravel(),
+    }
+    spec = {
+        "mark": "rect",
+        "encoding": {
+            "x": {"field": "x_lo", "type": "quantitative", "title": x_label, "scale": {"zero": False, "nice": False}},
+            "x2": {"field": "x_hi"},
+            "y": {"field": "y_lo", "type": "quantitative", "title": y_label, "scale": {"zero": False, "nice": False}},
+            "y2": {"field": "y_hi"},
+            "color": {"field": "value", "type": "quantitative", "title": value_label,
+                      "scale": {"scheme": "redyellowgreen"}},
+            "tooltip": [
+                {"field": "x", "type": "quantitative", "title": x_label, "format": ",.3~f"},
+                {"field": "y", "type": "quantitative", "title": y_label, "format": ",.3~f"},
+                {"field": "value", "type": "quantitative", "title": value_label, "format": ",.2f"},
+            ],
+        },
+    }
+    return data, spec
+
+
+def cashflow_hash(ledger, *extra):
+    digest = hashlib.sha256()
+    for col in CHART_SERIES.values():
+        digest.update(np.ascontiguousarray(ledger[col], dtype=float).tobytes())
+    digest.update("|".join(map(str, ledger["Month Name"])).encode("utf-8"))
+    digest.update(repr(extra).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _figure(figsize):
+    # Figure without pyplot: no global figure registry to leak or lock
+    from matplotlib.figure import Figure
+
+    return Figure(figsize=figsize)
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
+
+
+def cashflow_png(ledger, max_points=MAX_POINTS, figsize=(14, 6)):
+    """PNG bytes of the cashflow chart, cached by the plotted data."""
+    key = cashflow_hash(ledger, max_points, figsize)
+    return _png_cache.get_or_compute(key, lambda: _render_cashflow(ledger, max_points, figsize))
+
+
+def _render_cashflow(ledger, max_points, figsize):
+    data = chart_data(ledger, max_points)
+    labels = np.asarray(ledger["Month Name"])[data["Month"]]
+    x = np.arange(len(labels))
+    markers = len(x) <= MARKER_LIMIT
+
+    fig = _figure(figsize)
+    ax = fig.subplots()
+    ax.plot(x, data["Cash Invested"], label="Cash Invested", marker="o" if markers else None)
+    ax.plot(x, data["Loan"], label="Loan", marker="x" if markers else None)
+    ax.plot(x, data["Net Position"], label="Net Position", linestyle="--", color="purple")
+    step = max(2, -(-len(x) // MAX_TICKS))
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels(labels[::step], rotation=45)
+    ax.grid(True)
+    ax.legend()
+    return _png(fig)
+
+
+def heatmap_png(surface, xs, ys, x_label, y_label, value_label, figsize=(7, 6)):
+    """PNG bytes of a sensitivity surface, cached by its values and axes."""
+    digest = hashlib.sha256()
+    for arr in (surface, xs, ys):
+        digest.update(np.ascontiguousarray(arr, dtype=float).tobytes())
+    digest.update(repr((x_label, y_label, value_label, figsize)).encode("utf-8"))
+
+    def render():
+        fig = _figure(figsize)
+        ax = fig.subplots()
+        im = ax.imshow(surface, origin="lower", aspect="auto", cmap="RdYlGn",
+                       extent=(xs[0], xs[-1], ys[0], ys[-1]))
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
+        fig.colorbar(im, ax=ax, label=value_label)
+        return _png(fig)
+
+    return _png_cache.get_or_compute(digest.hexdigest(), render)
@@ -0,0 +1,57 @@
+# Measure cold-start import time of the app's modules in fresh interpreters
+#
+#   python cold_start.py            # engine modules only
+#   python cold_start.py --app      # plus streamlit, as a replica would load it
+#
+# Heavy libraries (pandas, matplotlib) are imported lazily by the engine, so
+# they should not show up in the engine-only numbers.
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+ENGINE_MODULES = [
+    "feasibility", "feasibility_cache", "drawdown", "unit_table", "sensitivity", "risk", "goal_seek", "returns",
+    "staging", "event_ledger", "portfolio", "export", "project_store", "instrumentation", "charts",
+]
+HEAVY_MODULES = ["pandas", "matplotlib", "dateutil"]
+
+PROBE = """
+import sys, time
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - t0
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure(modules, runs=5):
+    """Median seconds to import ``modules`` in a fresh interpreter, plus any heavy imports seen."""
+    times, loaded = [], ""
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(modules=modules, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1] if len(out) > 1 else ""
+    return statistics.median(times), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time.")
+    parser.add_argument("--app", action="store_true", help="include streamlit in the measurement")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    modules = (["streamlit"] if args.app else []) + ENGINE_MODULES
+    seconds, loaded = measure(modules, args.runs)
+    print(f"cold start: {seconds * 1000:.0f} ms (median of {args.runs})")
+    print(f"heavy modules loaded: {loaded or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# Streaming export of ledgers and summary tables to CSV, Parquet and Excel
+#
+# Writers consume an iterable of column chunks (dict of equal-length arrays)
+# and append each chunk as it arrives, so a 50k-scenario ledger never exists
+# as one table or one string. Every file gets a ``<file>.inputs.json``
+# sidecar recording the inputs that produced it; Parquet files also carry it
+# in their key-value metadata and Excel files in an "Inputs" sheet.
+#
+# Parquet needs pyarrow and Excel needs openpyxl; both are imported on use.
+#
+# As a script it exports the per-scenario ledgers of a two-way sensitivity
+# sweep over a stored scenario:
+#
+#   python export.py "Smith St" sweep.parquet --x land_price --y sale --steps 20
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+from feasibility import LEDGER_COLUMNS, PROJECT_START, as_month, ledger_flows, month_labels
+from feasibility_cache import OPTION_DEFAULTS, input_hash
+from sensitivity import SENSITIVITY_INPUTS, default_values, scenario_blocks
+
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".xlsx": "excel"}
+CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_575  # per sheet, leaving room for the header
+
+# Compact Parquet types: dollars stay float64, ratios drop to float32,
+# indices to int32 and repeated labels are dictionary-encoded.
+INT_COLUMNS = {"Scenario", "Month", "Period"}
+LABEL_COLUMNS = {"Month Name", "Period Name", "grade", "color", "error"}
+RATIO_COLUMNS = {"roi_cash", "roi_total", "roi_all", "project_irr", "equity_irr", "equity_multiple"}
+
+
+def export_format(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Cannot infer export format for '{path}'; use .csv, .parquet or .xlsx")
+    return fmt
+
+
+def provenance(land_price, land_lvr, soft_costs, interest_rate, units, **options):
+    """Input record for a single project (or the base case of a scenario run)."""
+    return {
+        "input_hash": input_hash(land_price, land_lvr, soft_costs, interest_rate, units, **options),
+        "inputs": {
+            "land_price": land_price, "land_lvr": land_lvr, "soft_costs": soft_costs,
+            "interest_rate": interest_rate, "units": list(units),
+            **{k: str(v) for k, v in options.items()},
+        },
+    }
+
+
+# --- Chunk Sources ---
+def ledger_chunks(ledger, chunk_rows=CHUNK_ROWS):
+    """Split one project's ledger dict into row chunks."""
+    n = len(ledger["Month"])
+    for lo in range(0, n, chunk_rows):
+        yield {col: np.asarray(ledger[col])[lo:lo + chunk_rows] for col in LEDGER_COLUMNS}
+
+
+def scenario_ledger_chunks(base, overrides, block_size=2048):
+    """Long-format ledgers (one row per scenario-month) for a scenario run.
+
+    ``base``/``overrides`` are as for sensitivity.evaluate; each block of
+    scenarios is computed and emitted before the next one starts.
+    """
+    start = base.get("start", PROJECT_START)
+    for sl, args, kwargs in scenario_blocks(base, overrides, block_size):
+        flows = ledger_flows(*args, **kwargs)
+        n_scen, n_months = flows["cash"].shape
+        cum_cash = np.cumsum(flows["cash"], axis=1)
+        labels = month_labels(n_months, start)
+        yield {
+            "Scenario": np.repeat(np.arange(sl.start, sl.stop), n_months),
+            "Month": np.tile(np.arange(n_months), n_scen),
+            "Month Name": np.tile(labels, n_scen),
+            "Cash Out ($)": flows["cash"].ravel(),
+            "Loan In ($)": flows["loan"].ravel(),
+            "Interest ($)": flows["interest"].ravel(),
+            "Loan Repaid ($)": flows["repaid"].ravel(),
+            "Cumulative Cash ($)": cum_cash.ravel(),
+            "Loan Balance ($)": flows["balance"].ravel(),
+            "Net Cash Position ($)": (cum_cash - flows["balance"]).ravel(),
+        }
+
+
+def table_chunks(columns, chunk_rows=CHUNK_ROWS):
+    """Split an in-memory table (dict of arrays or lists) into row chunks."""
+    n = len(next(iter(columns.values())))
+    for lo in range(0, n, chunk_rows):
+        yield {k: np.asarray(v)[lo:lo + chunk_rows] for k, v in columns.items()}
+
+
+# --- Writers ---
+def _write_csv(chunks, path):
+    import pandas as pd
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            pd.DataFrame(chunk).to_csv(f, header=i == 0, index=False)
+
+
+def _arrow_schema(chunk):
+    import pyarrow as pa
+
+    fields = []
+    for name, values in chunk.items():
+        values = np.asarray(values)
+        if name in INT_COLUMNS:
+            typ = pa.int32()
+        elif name in LABEL_COLUMNS or values.dtype.kind in "OUS":
+            typ = pa.dictionary(pa.int32(), pa.string())
+        elif name in RATIO_COLUMNS:
+            typ = pa.float32()
+        elif values.dtype.kind == "b":
+            typ = pa.bool_()
+        elif values.dtype.kind == "M":
+            typ = pa.date32()
+        else:
+            typ = pa.float64()
+        fields.append(pa.field(name, typ))
+    return pa.schema(fields)
+
+
+def _label_array(values):
+    """String Arrow array with None/NaN entries as nulls rather than "None"/"nan"."""
+    import pyarrow as pa
+
+    values = np.asarray(values)
+    if values.dtype.kind in "US":
+        return pa.array(values.astype(str))
+    missing = np.array([v is None or (isinstance(v, float) and v != v) for v in values.ravel()], dtype=bool)
+    return pa.array(values.astype(str), mask=missing)
+
+
+def _write_parquet(chunks, path, record):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from exc
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = _arrow_schema(chunk).with_metadata({"inputs": json.dumps(record, default=str)})
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            arrays = [
+                _label_array(chunk[f.name]).dictionary_encode().cast(f.type)
+                if pa.types.is_dictionary(f.type) else pa.array(np.asarray(chunk[f.name]), type=f.type)
+                for f in schema
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_excel(chunks, path, record):
+    try:
+        from openpyxl import Workbook
+    except ImportError as exc:
+        raise ImportError("Excel export needs openpyxl: pip install openpyxl") from exc
+
+    wb = Workbook(write_only=True)
+    sheet, rows_in_sheet, header = None, 0, None
+    for chunk in chunks:
+        if header is None:
+            header = list(chunk)
+        cols = [np.asarray(chunk[k]).tolist() for k in header]
+        for row in zip(*cols):
+            if sheet is None or rows_in_sheet >= EXCEL_MAX_ROWS:
+                sheet = wb.create_sheet(f"Data {len(wb.worksheets) + 1}")
+                sheet.append(header)
+                rows_in_sheet = 0
+            sheet.append(row)
+            rows_in_sheet += 1
+
+    inputs = wb.create_sheet("Inputs")
+    for key, value in record.items():
+        inputs.append([key, value if isinstance(value, (str, int, float)) else json.dumps(value, default=str)])
+    wb.save(path)
+
+
+def write_chunks(chunks, path, record=None, fmt=None):
+    """Stream ``chunks`` to ``path`` and write the ``<path>.inputs.json`` sidecar.
+
+    ``record`` describes the inputs behind the data (see ``provenance``).
+    Returns the sidecar path.
+    """
+    fmt = export_format(path, fmt)
+    record = {
+        **(record or {}),
+        "format": fmt,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if fmt == "csv":
+        _write_csv(chunks, path)
+    elif fmt == "parquet":
+        _write_parquet(chunks, path, record)
+    else:
+        _write_excel(chunks, path, record)
+
+    sidecar = path + ".inputs.json"
+    with open(sidecar, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2, default=str)
+    return sidecar
+
+
+def export_bytes(chunks, fmt, record=None):
+    """Encode chunks in ``fmt`` and return the file bytes (for download buttons)."""
+    import tempfile
+
+    suffix = {"csv": ".csv", "parquet": ".parquet", "excel": ".xlsx"}[fmt]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export" + suffix)
+        write_chunks(chunks, path, record, fmt)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def sweep_chunks(base, x_name, x_values, y_name, y_values, block_size=2048):
+    """Scenario ledgers of a two-way sweep with each row's swept input values.
+
+    Scenarios run row-major over (y, x), as in sensitivity.sensitivity_grid.
+    """
+    xx, yy = np.meshgrid(np.asarray(x_values, dtype=float), np.asarray(y_values, dtype=float))
+    xx, yy = xx.ravel(), yy.ravel()
+    for chunk in scenario_ledger_chunks(base, {x_name: xx, y_name: yy}, block_size):
+        yield {x_name: xx[chunk["Scenario"]], y_name: yy[chunk["Scenario"]], **chunk}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the scenario ledgers of a two-way sensitivity sweep.")
+    parser.add_argument("project", help="project in the store")
+    parser.add_argument("output", help="CSV, Parquet or Excel (.xlsx) file for the ledgers")
+    parser.add_argument("--db", default=None, help="project store (default: $FEASIBILITY_DB or feasibility.db)")
+    parser.add_argument("--scenario", default="Base", help="scenario to sweep around")
+    parser.add_argument("--x", choices=SENSITIVITY_INPUTS, default="land_price", help="first swept input")
+    parser.add_argument("--y", choices=SENSITIVITY_INPUTS, default="sale", help="second swept input")
+    parser.add_argument("--steps", type=int, default=10, help="values per axis")
+    parser.add_argument("--swing", type=float, default=0.2, help="sweep range (±) around the base case")
+    args = parser.parse_args(argv)
+    if args.x == args.y:
+        parser.error("--x and --y must be two different inputs")
+
+    from project_store import DEFAULT_PATH, ProjectStore
+
+    try:
+        base = ProjectStore(args.db or DEFAULT_PATH).load_scenario(args.project, args.scenario)
+    except KeyError as exc:
+        print(exc.args[0], file=sys.stderr)
+        return 1
+    base["start"] = as_month(base.get("start", PROJECT_START))
+    xs = default_values(base, args.x, args.steps, args.swing)
+    ys = default_values(base, args.y, args.steps, args.swing)
+    options = {k: base[k] for k in OPTION_DEFAULTS if k in base}
+    record = {
+        **provenance(base["land_price"], base["land_lvr"], base["soft_costs"], base["interest_rate"],
+                     base["units"], **options),
+        "project": args.project, "scenario": args.scenario,
+        "sweep": {args.x: xs.tolist(), args.y: ys.tolist()},
+    }
+    try:
+        write_chunks(sweep_chunks(base, args.x, xs, args.y, ys), args.output, record)
+    except ImportError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(f"{len(xs) * len(ys):,} scenarios written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+# Headless feasibility engine: monthly ledger and deal metrics as NumPy arrays
+#
+# The core works on batches: global inputs broadcast to shape (S,) and unit
+# columns to (S, U), so one call can evaluate a single project (S=1) or a
+# whole sensitivity grid.
+
+from functools import lru_cache
+
+import numpy as np
+
+from drawdown import draw_weights
+
+# --- Model Constants ---
+MODEL_VERSION = 2  # bump when results change for the same inputs; part of every input hash
+UNIT_FIELDS = ("label", "size", "rate", "cont", "start", "duration", "sale")
+UNIT_COLUMNS = ("size", "rate", "cont", "start", "duration", "sale")
+LEDGER_COLUMNS = [
+    "Month", "Month Name", "Cash Out ($)", "Loan In ($)", "Interest ($)", "Loan Repaid ($)",
+    "Cumulative Cash ($)", "Loan Balance ($)", "Net Cash Position ($)",
+]
+CONSTRUCTION_LOAN_SHARE = 0.7  # pro-rata debt share of each draw when no equity_first amount is set
+ACCRUAL_METHODS = ("monthly", "daily")
+PROJECT_START = np.datetime64("2025-03", "M")
+MONTH_ABBR = np.array(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])
+
+# (minimum cash-on-cash ROI %, grade, colour), checked top to bottom
+GRADE_BANDS = (
+    (80, "A+", "🟢"),
+    (60, "A", "🟢"),
+    (40, "B", "🟡"),
+    (20, "C", "🟠"),
+)
+
+
+def unit_arrays(units):
+    """Convert a list of unit dicts (or a UnitTable) into typed column arrays."""
+    if hasattr(units, "arrays"):
+        return units.arrays()
+    cols = {
+        "size": np.array([u["size"] for u in units], dtype=float),
+        "rate": np.array([u["rate"] for u in units], dtype=float),
+        "cont": np.array([u["cont"] for u in units], dtype=float),
+        "start": np.array([u["start"] for u in units], dtype=np.int64),
+        "duration": np.array([u["duration"] for u in units], dtype=np.int64),
+        "sale": np.array([u["sale"] for u in units], dtype=float),
+    }
+    if (cols["duration"] <= 0).any():
+        raise ValueError("Unit build duration must be at least 1 month")
+    if (cols["start"] < 0).any():
+        raise ValueError("Unit start month must not be before month 0")
+    return cols
+
+
+def construction_cost(cols):
+    """Per-unit construction cost including contingency."""
+    base = cols["size"] * cols["rate"]
+    return base + cols["cont"] * base
+
+
+def sale_months(cols):
+    """Settlement month of each unit (the month after practical completion)."""
+    return cols["start"] + cols["duration"] + 1
+
+
+def deal_grade(roi_cash):
+    """Letter grade and colour marker for a cash-on-cash ROI (%)."""
+    for floor, grade, color in GRADE_BANDS:
+        if roi_cash >= floor:
+            return grade, color
+    if roi_cash > 0:
+        return "D", "🔴"
+    return "F", "🟥"
+
+
+def deal_grades(roi_cash):
+    """Vectorized deal_grade: array of grade letters for an array of ROIs."""
+    roi_cash = np.asarray(roi_cash)
+    conds = [roi_cash >= floor for floor, _, _ in GRADE_BANDS] + [roi_cash > 0]
+    return np.select(conds, [g for _, g, _ in GRADE_BANDS] + ["D"], default="F")
+
+
+def as_month(start):
+    """Normalise a date, datetime, 'YYYY-MM[-DD]' string or datetime64 to datetime64[M]."""
+    if isinstance(start, str):
+        start = start[:7]
+    elif hasattr(start, "year") and hasattr(start, "month"):
+        start = f"{start.year:04d}-{start.month:02d}"
+    return np.datetime64(start, "M")
+
+
+@lru_cache(maxsize=32)
+def _label_table(start, size):
+    months = start + np.arange(size)
+    years = months.astype("datetime64[Y]").astype(int) + 1970
+    table = np.char.add(np.char.add(MONTH_ABBR[months.astype(int) % 12], "-"), years.astype(str))
+    table.flags.writeable = False  # shared between callers
+    return table
+
+
+def month_index(n_months, start=PROJECT_START):
+    """Calendar month (datetime64[M]) of every ledger month."""
+    return as_month(start) + np.arange(n_months)
+
+
+def month_labels(n_months, start=PROJECT_START):
+    """'Mar-2025' style labels, sliced from a cached per-start table."""
+    size = max(240, 1 << max(n_months - 1, 0).bit_length())
+    return _label_table(as_month(start), size)[:n_months]
+
+
+# --- Batched Core ---
+def broadcast_scenarios(land_price, land_lvr, soft_costs, cols):
+    """Broadcast global inputs to (S,) and unit columns to (S, U)."""
+    n_scen, = np.broadcast_shapes(
+        *(np.shape(np.atleast_1d(v)) for v in (land_price, land_lvr, soft_costs)),
+        *(np.atleast_2d(cols[k]).shape[:1] for k in UNIT_COLUMNS),
+    )
+    g = [np.broadcast_to(np.asarray(v, dtype=float), (n_scen,)) for v in (land_price, land_lvr, soft_costs)]
+    n_units, = np.broadcast_shapes(*(np.shape(cols[k])[-1:] for k in UNIT_COLUMNS))
+    c = {k: np.broadcast_to(np.atleast_2d(cols[k]), (n_scen, n_units)) for k in UNIT_COLUMNS}
+    if (c["duration"] <= 0).any():
+        raise ValueError("Unit build duration must be at least 1 month")
+    if (c["start"] < 0).any():
+        raise ValueError("Unit start month must not be before month 0")
+    return g, c
+
+
+def build_months(start, duration):
+    """(owner, month) of every build month, for flat start/duration arrays.
+
+    ``owner`` indexes the unit each month belongs to, so per-unit values can
+    be scattered onto the calendar with one bincount.
+    """
+    owner = np.repeat(np.arange(start.size), duration)
+    offsets = np.arange(owner.size) - np.repeat(np.cumsum(duration) - duration, duration)
+    return owner, start[owner] + offsets
+
+
+def build_draws(cost, start, duration, drawdown="flat"):
+    """(owner, month, amount) of every build month for flat per-unit arrays.
+
+    ``drawdown`` names a drawdown.PROFILES entry; "flat" spreads each unit's
+    cost evenly over its build months, as the original model did.
+    """
+    owner, months = build_months(start, duration)
+    if drawdown == "flat":
+        amounts = (cost / duration)[owner]
+    else:
+        amounts = cost[owner] * draw_weights(drawdown, duration, owner, months - start[owner])
+    return owner, months, amounts
+
+
+def stack_units(unit_lists):
+    """Pad several projects' unit lists into (P, U) columns for one batch call.
+
+    Padding units copy the project's first unit timing with zero size and sale
+    price, so they add no cost or revenue and never move the first sale month.
+    """
+    per_project = [unit_arrays(units) for units in unit_lists]
+    if any(not len(c["size"]) for c in per_project):
+        raise ValueError("Every project needs at least one unit")
+    width = max(len(c["size"]) for c in per_project)
+    stacked = {}
+    for k in UNIT_COLUMNS:
+        fill_zero = k in ("size", "sale")
+        stacked[k] = np.stack([
+            np.concatenate([c[k], np.full(width - len(c[k]), 0 if fill_zero else c[k][0], dtype=c[k].dtype)])
+            for c in per_project
+        ])
+    return stacked
+
+
+def ledger_flows(land_price, land_lvr, soft_costs, cols, interest_rate=0.0,
+                 repay_from_sales=True, accrual="monthly", start=PROJECT_START,
+                 drawdown="flat", equity_first=None):
+    """Monthly flows for a batch of scenarios; see assemble_flows for the keys.
+
+    Construction cost is spread over each unit's build months by the
+    ``drawdown`` profile with a single scatter-add; sale proceeds land in the
+    settlement month. Months before month 0 are dropped.
+    """
+    (land_price, land_lvr, soft_costs), c = broadcast_scenarios(land_price, land_lvr, soft_costs, cols)
+    n_scen, n_units = c["start"].shape
+    sales = sale_months(c)
+    n_months = int(max(sales.max(), 0)) + 2
+
+    owner, months, amounts = build_draws(
+        construction_cost(c).ravel(), c["start"].ravel(), c["duration"].ravel(), drawdown,
+    )
+    row = owner // n_units * n_months
+    keep = months >= 0
+    draws = np.bincount(
+        row[keep] + months[keep], weights=amounts[keep], minlength=n_scen * n_months,
+    ).reshape(n_scen, n_months)
+
+    sold = sales >= 0
+    scen = np.broadcast_to(np.arange(n_scen)[:, None], sales.shape)
+    proceeds = np.bincount(
+        (scen * n_months + sales)[sold], weights=c["sale"][sold], minlength=n_scen * n_months,
+    ).reshape(n_scen, n_months)
+
+    return assemble_flows(
+        draws, proceeds, land_price, land_lvr, soft_costs,
+        interest_rate=interest_rate, repay_from_sales=repay_from_sales, accrual=accrual, start=start,
+        equity_first=equity_first,
+    )
+
+
+def growth_factors(interest_rate, n_months, accrual="monthly", start=PROJECT_START):
+    """Per-month balance growth factors g_t, shaped (..., n_months).
+
+    Interest for month t accrues on the balance carried out of month t-1, so
+    g_0 is 1. Monthly accrual compounds at rate/12; daily accrual compounds
+    at rate/365 over the actual days in each calendar month.
+    """
+    rate = np.asarray(interest_rate, dtype=float)[..., None]
+    if accrual == "monthly":
+        g = np.broadcast_to(1 + rate / 12, rate.shape[:-1] + (n_months,)).copy()
+    elif accrual == "daily":
+        days = np.diff(month_index(n_months, start).astype("datetime64[D]")).astype(float)
+        g = np.ones(rate.shape[:-1] + (n_months,))
+        g[..., 1:] = (1 + rate / 365) ** days
+    else:
+        raise ValueError(f"Unknown interest accrual '{accrual}'; expected one of {ACCRUAL_METHODS}")
+    g[..., 0] = 1.0
+    return g
+
+
+def capitalise_interest(loan_in, proceeds, growth, repay_from_sales=True):
+    """Loan balance with capitalised interest, as a vectorized recurrence.
+
+    The balance follows B_t = g_t * B_{t-1} + L_t - R_t. With repayment from
+    sales, R_t = min(P_t, g_t * B_{t-1} + L_t), i.e. B_t = max(0, ...). Dividing
+    by the discount factor D_t = prod(g) turns this into a reflected cumulative
+    sum, so the whole horizon is a few cumsum/accumulate passes.
+    Returns (balance, interest, repaid).
+    """
+    discount = np.cumprod(growth, axis=-1)
+    if repay_from_sales:
+        z = np.cumsum((loan_in - proceeds) / discount, axis=-1)
+        floor = np.minimum(np.minimum.accumulate(z, axis=-1), 0.0)
+        balance = discount * (z - floor)
+    else:
+        balance = discount * np.cumsum(loan_in / discount, axis=-1)
+    carried = np.concatenate([np.zeros_like(balance[..., :1]), balance[..., :-1]], axis=-1)
+    interest = carried * (growth - 1)
+    repaid = carried + interest + loan_in - balance
+    # Snap float residue from the discounted sums
+    repaid = np.where(np.abs(repaid) < 1e-6, 0.0, repaid)
+    balance = np.where(np.abs(balance) < 1e-6, 0.0, balance)
+    return balance, interest, repaid
+
+
+def split_draws(draws, equity_first=None):
+    """(equity, loan) funding of construction draws along the last axis.
+
+    Pro rata at CONSTRUCTION_LOAN_SHARE by default, or with ``equity_first``
+    (dollars, scalar or (S,)) equity pays every draw until it has contributed
+    that much and debt funds the rest. Returns new arrays.
+    """
+    if equity_first is None:
+        return draws * (1 - CONSTRUCTION_LOAN_SHARE), draws * CONSTRUCTION_LOAN_SHARE
+    cap = np.asarray(equity_first, dtype=float)[..., None]
+    equity = np.diff(np.minimum(np.cumsum(draws, axis=-1), cap), axis=-1, prepend=0.0)
+    return equity, draws - equity
+
+
+def assemble_flows(draws, proceeds, land_price, land_lvr, soft_costs, interest_rate=0.0,
+                   repay_from_sales=True, accrual="monthly", start=PROJECT_START, equity_first=None):
+    """Turn construction draws and sale proceeds into the funded monthly flows.
+
+    Draws are split into equity and debt by split_draws. Land settles at
+    month 0 and the loan accrues capitalised interest until it is repaid
+    from sale proceeds. Works on (n_months,) or (S, n_months) arrays; see
+    funded_flows for the returned keys.
+    """
+    equity, loan = split_draws(draws, equity_first)
+    equity[..., 0] += land_price * (1 - land_lvr) + soft_costs
+    loan[..., 0] += land_price * land_lvr
+
+    growth = growth_factors(interest_rate, draws.shape[-1], accrual, start)
+    return funded_flows(equity, loan, proceeds, growth, repay_from_sales)
+
+
+def funded_flows(equity, loan, proceeds, growth, repay_from_sales=True):
+    """Flows from per-period equity, debt and proceeds and the balance growth factors.
+
+    Returns a dict of ``cash`` (net equity out), ``loan`` (debt drawn),
+    ``interest``, ``repaid`` and ``balance`` (loan balance incl. capitalised
+    interest).
+    """
+    balance, interest, repaid = capitalise_interest(loan, proceeds, growth, repay_from_sales)
+    return {
+        "cash": equity - proceeds + repaid,
+        "loan": loan,
+        "interest": interest,
+        "repaid": repaid,
+        "balance": balance,
+    }
+
+
+def derive_metrics(flows, cols, land_price, soft_costs):
+    """Timing-based and all-in metrics from (S, n_months) flows as (S,) arrays."""
+    return flow_metrics(
+        flows, sale_months(cols).min(axis=-1), cols["sale"].sum(axis=-1), construction_cost(cols).sum(axis=-1),
+        land_price, soft_costs,
+    )
+
+
+def flow_metrics(flows, first_sale, total_revenue, total_construction, land_price, soft_costs):
+    """Metrics from (S, n) flows given the (S,) index of the first settlement along the flows axis."""
+    cum_cash = np.cumsum(flows["cash"], axis=-1)
+    balance = flows["balance"]
+    interest = flows["interest"]
+    rows = np.arange(cum_cash.shape[0])
+
+    # Interest accrued after the first sale still belongs to the project cost
+    late_interest = np.cumsum(interest[:, ::-1], axis=-1)[:, ::-1][rows, first_sale]
+    total_project_cost = cum_cash[rows, first_sale - 1] + balance[rows, first_sale - 1] + late_interest
+    gross_profit = total_revenue - total_project_cost
+    peak_cash = cum_cash.max(axis=-1)
+
+    interest_cost = interest.sum(axis=-1)
+    full_cost = land_price + soft_costs + total_construction + interest_cost
+    profit_all = total_revenue - full_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi_cash = gross_profit / peak_cash * 100
+        roi_total = gross_profit / total_project_cost * 100
+        roi_all = profit_all / full_cost * 100
+    return {
+        "total_revenue": total_revenue,
+        "total_construction": total_construction,
+        "interest_cost": interest_cost,
+        "full_cost": full_cost,
+        "profit_all": profit_all,
+        "roi_all": roi_all,
+        "total_project_cost": total_project_cost,
+        "gross_profit": gross_profit,
+        "peak_cash": peak_cash,
+        "roi_cash": roi_cash,
+        "roi_total": roi_total,
+    }
+
+
+def scenario_metrics(land_price, land_lvr, soft_costs, cols, interest_rate=0.0,
+                     repay_from_sales=True, accrual="monthly", start=PROJECT_START,
+                     drawdown="flat", equity_first=None):
+    """Deal metrics for a batch of scenarios as (S,) arrays."""
+    (land_price, land_lvr, soft_costs), c = broadcast_scenarios(land_price, land_lvr, soft_costs, cols)
+    flows = ledger_flows(
+        land_price, land_lvr, soft_costs, c,
+        interest_rate=interest_rate, repay_from_sales=repay_from_sales, accrual=accrual, start=start,
+        drawdown=drawdown, equity_first=equity_first,
+    )
+    return derive_metrics(flows, c, land_price, soft_costs)
+
+
+# --- Single Project ---
+def build_ledger(land_price, land_lvr, soft_costs, units, interest_rate=0.0,
+                 repay_from_sales=True, accrual="monthly", start=PROJECT_START,
+                 drawdown="flat", equity_first=None):
+    """Monthly cashflow ledger as a dict of arrays keyed by LEDGER_COLUMNS."""
+    flows = ledger_flows(
+        land_price, land_lvr, soft_costs, unit_arrays(units),
+        interest_rate=interest_rate, repay_from_sales=repay_from_sales, accrual=accrual, start=start,
+        drawdown=drawdown, equity_first=equity_first,
+    )
+    return ledger_from_flows({k: v[0] for k, v in flows.items()}, start)
+
+
+def ledger_from_flows(flows, start=PROJECT_START):
+    """Ledger columns from one scenario's (n_months,) flows."""
+    cash = flows["cash"]
+    cum_cash = np.cumsum(cash)
+    return {
+        "Month": np.arange(len(cash)),
+        "Month Name": month_labels(len(cash), start),
+        "Cash Out ($)": cash,
+        "Loan In ($)": flows["loan"],
+        "Interest ($)": flows["interest"],
+        "Loan Repaid ($)": flows["repaid"],
+        "Cumulative Cash ($)": cum_cash,
+        "Loan Balance ($)": flows["balance"],
+        "Net Cash Position ($)": cum_cash - flows["balance"],
+    }
+
+
+def compute_metrics(ledger, units, land_price, soft_costs):
+    """Timing-based and all-in profitability metrics for a built ledger."""
+    flows = {
+        "cash": ledger["Cash Out ($)"][None, :],
+        "interest": ledger["Interest ($)"][None, :],
+        "balance": ledger["Loan Balance ($)"][None, :],
+    }
+    cols = {k: v[None, :] for k, v in unit_arrays(units).items()}
+    metrics = {k: float(v[0]) for k, v in derive_metrics(flows, cols, land_price, soft_costs).items()}
+    metrics["grade"], metrics["color"] = deal_grade(metrics["roi_cash"])
+    return metrics
+
+
+def run_feasibility(land_price, land_lvr, soft_costs, interest_rate, units,
+                    repay_from_sales=True, accrual="monthly", start=PROJECT_START,
+                    drawdown="flat", equity_first=None):
+    """Build the ledger and metrics for one project."""
+    if not units:
+        raise ValueError("At least one unit is required")
+    ledger = build_ledger(
+        land_price, land_lvr, soft_costs, units,
+        interest_rate=interest_rate, repay_from_sales=repay_from_sales, accrual=accrual, start=start,
+        drawdown=drawdown, equity_first=equity_first,
+    )
+    metrics = compute_metrics(ledger, units, land_price, soft_costs)
+    return {"ledger": ledger, "metrics": metrics}
+
+
+def ledger_frame(ledger):
+    """Ledger as a pandas DataFrame (pandas imported on demand)."""
+    import pandas as pd
+
+    return pd.DataFrame({col: ledger[col] for col in LEDGER_COLUMNS})
@@ -0,0 +1,346 @@
+# Headless JSON API for feasibility runs
+#
+#   python feasibility_api.py --port 8765 --workers 8
+#
+#   POST /feasibility        one project  -> {"input_hash", "metrics", "ledger"}
+#   POST /feasibility/batch  {"projects": [...]} -> {"results": [...]}
+#   GET  /health             cache and worker statistics
+#
+# A project carries the sidebar inputs (land_price, land_lvr, soft_costs,
+# interest_rate as a fraction, and optionally accrual, repay_from_sales,
+# start as "YYYY-MM", drawdown and equity_first) plus "units", a list of Add
+# Unit dicts. Set "include_ledger": false to get metrics only, and
+# "discount_rate" (annual fraction) to add IRR, NPV, equity multiple and
+# payback under "returns".
+#
+# The event loop only parses HTTP and hashes inputs; runs (and their JSON
+# encoding) happen in a process pool. Identical payloads share one result:
+# finished ones through an LRU cache keyed by input hash, concurrent ones by
+# awaiting the same in-flight future. Batch misses are sent to the pool in
+# chunks to amortise inter-process overhead.
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http import HTTPStatus
+
+from drawdown import PROFILES
+from feasibility import ACCRUAL_METHODS, LEDGER_COLUMNS, PROJECT_START, UNIT_FIELDS, as_month, run_feasibility
+from feasibility_cache import ResultCache, input_hash
+from returns import ledger_returns
+
+GLOBAL_FIELDS = ("land_price", "land_lvr", "soft_costs", "interest_rate")
+MAX_BODY = 16 * 1024 * 1024
+MAX_MONTHS = 1200  # latest unit completion accepted; bounds a worker's ledger size
+RUN_OPTIONS = ("repay_from_sales", "accrual", "start", "drawdown", "equity_first")
+BATCH_CHUNK = 64  # projects per pool task for batch requests
+
+
+class RequestError(ValueError):
+    """Malformed request; reported to the client as 400."""
+
+
+def parse_project(payload):
+    """Validated engine inputs from a request object.
+
+    Returns (key, project) where ``key`` is the input hash (plus the ledger
+    flag and discount rate) used to deduplicate runs.
+    """
+    if not isinstance(payload, dict):
+        raise RequestError("Project must be a JSON object")
+    missing = [k for k in GLOBAL_FIELDS + ("units",) if k not in payload]
+    if missing:
+        raise RequestError(f"Missing field(s): {', '.join(missing)}")
+    try:
+        project = {k: float(payload[k]) for k in GLOBAL_FIELDS}
+        units = payload["units"]
+        if not isinstance(units, list) or not units:
+            raise RequestError("'units' must be a non-empty list")
+        project["units"] = [
+            {
+                "label": str(u.get("label", f"Unit {i + 1}")),
+                **{k: (int(u[k]) if k in ("start", "duration") else float(u[k])) for k in UNIT_FIELDS[1:]},
+            }
+            for i, u in enumerate(units)
+        ]
+    except (KeyError, TypeError, ValueError, AttributeError) as exc:
+        if isinstance(exc, RequestError):
+            raise
+        raise RequestError(f"Invalid project inputs: {exc!r}") from exc
+    numbers = [project[k] for k in GLOBAL_FIELDS] + [u[k] for u in project["units"] for k in UNIT_FIELDS[1:]]
+    if not all(math.isfinite(v) for v in numbers):
+        raise RequestError("Project inputs must be finite numbers")
+    for u in project["units"]:
+        if u["start"] < 0:
+            raise RequestError(f"Unit '{u['label']}': 'start' must not be before month 0")
+        if u["duration"] < 1:
+            raise RequestError(f"Unit '{u['label']}': 'duration' must be at least 1 month")
+        if u["start"] + u["duration"] > MAX_MONTHS:
+            raise RequestError(f"Unit '{u['label']}': must complete within {MAX_MONTHS} months")
+
+    accrual = payload.get("accrual", ACCRUAL_METHODS[0])
+    if accrual not in ACCRUAL_METHODS:
+        raise RequestError(f"'accrual' must be one of {ACCRUAL_METHODS}")
+    try:
+        start = as_month(payload.get("start", PROJECT_START))
+    except ValueError as exc:
+        raise RequestError(f"Invalid 'start': {payload.get('start')!r}") from exc
+    flags = {k: payload.get(k, True) for k in ("repay_from_sales", "include_ledger")}
+    for name, value in flags.items():
+        if not isinstance(value, bool):
+            raise RequestError(f"'{name}' must be true or false")
+    drawdown = payload.get("drawdown", "flat")
+    if drawdown not in PROFILES:
+        raise RequestError(f"'drawdown' must be one of {tuple(PROFILES)}")
+    equity_first = payload.get("equity_first")
+    try:
+        equity_first = None if equity_first is None else float(equity_first)
+    except (TypeError, ValueError) as exc:
+        raise RequestError(f"Invalid 'equity_first': {equity_first!r}") from exc
+    if equity_first is not None and not math.isfinite(equity_first):
+        raise RequestError("'equity_first' must be a finite number")
+    discount_rate = payload.get("discount_rate")
+    try:
+        discount_rate = None if discount_rate is None else float(discount_rate)
+    except (TypeError, ValueError) as exc:
+        raise RequestError(f"Invalid 'discount_rate': {discount_rate!r}") from exc
+    if discount_rate is not None and not (discount_rate > -1 and math.isfinite(discount_rate)):
+        raise RequestError("'discount_rate' must be a finite number greater than -1")
+    options = {
+        "repay_from_sales": flags["repay_from_sales"], "accrual": accrual, "start": start,
+        "drawdown": drawdown, "equity_first": equity_first,
+    }
+    project.update(options, include_ledger=flags["include_ledger"], discount_rate=discount_rate)
+    key = input_hash(
+        project["land_price"], project["land_lvr"], project["soft_costs"], project["interest_rate"],
+        project["units"], **options,
+    )
+    key += ":L" if project["include_ledger"] else ":M"
+    if discount_rate is not None:
+        key += f":R{discount_rate!r}"
+    return key, project
+
+
+def _finite(value):
+    # NaN/inf ratios (e.g. ROI with no cash invested) become null, keeping the body strict JSON
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+def evaluate_many(projects):
+    """Run projects in a worker; returns (ok, JSON bytes) per project."""
+    out = []
+    for project in projects:
+        try:
+            result = run_feasibility(
+                project["land_price"], project["land_lvr"], project["soft_costs"], project["interest_rate"],
+                project["units"], **{k: project[k] for k in RUN_OPTIONS},
+            )
+            body = {"metrics": {k: _finite(v) for k, v in result["metrics"].items()}}
+            if project["discount_rate"] is not None:
+                returns = ledger_returns(result["ledger"], project["discount_rate"])
+                body["returns"] = {k: _finite(v) for k, v in returns.items()}
+            if project["include_ledger"]:
+                body["ledger"] = {col: result["ledger"][col].tolist() for col in LEDGER_COLUMNS}
+        except Exception as exc:  # one bad project must not sink the rest of its chunk
+            message = str(exc) if isinstance(exc, ValueError) else f"{type(exc).__name__}: {exc}"
+            out.append((False, json.dumps({"error": message}).encode("utf-8")))
+            continue
+        out.append((True, json.dumps(body).encode("utf-8")))
+    return out
+
+
+class FeasibilityService:
+    """Deduplicating front end to a process pool of feasibility runs."""
+
+    def __init__(self, workers=None, cache_size=4096):
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.cache = ResultCache(maxsize=cache_size)
+        self.inflight = {}
+        self.runs = 0
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def _submit(self, items):
+        """Send (key, project) items to the pool in chunks, registering a future per key."""
+        loop = asyncio.get_running_loop()
+        for lo in range(0, len(items), BATCH_CHUNK):
+            chunk = items[lo:lo + BATCH_CHUNK]
+            # Raises if the pool is broken; register the futures only once the chunk is queued
+            task = loop.run_in_executor(self.pool, evaluate_many, [project for _, project in chunk])
+            futures = {key: loop.create_future() for key, _ in chunk}
+            self.inflight.update(futures)
+            self.runs += len(chunk)
+            task.add_done_callback(partial(self._settle, futures))
+
+    def _settle(self, futures, task):
+        for i, (key, future) in enumerate(futures.items()):
+            self.inflight.pop(key, None)
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                ok, body = task.result()[i]
+                if ok:
+                    self.cache.put(key, (ok, body))
+                future.set_result((ok, body))
+
+    async def evaluate(self, parsed):
+        """(ok, JSON bytes) for each (key, project), in order."""
+        results, todo = {}, {}
+        for key, project in parsed:
+            if key in results or key in todo:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[key] = cached
+            elif key not in self.inflight:
+                todo[key] = project
+        self._submit(list(todo.items()))
+        # Take the futures before awaiting: settled keys leave self.inflight
+        pending = {key: self.inflight[key] for key, _ in parsed if key not in results}
+        for key, future in pending.items():
+            results[key] = await asyncio.shield(future)
+        return [results[key] for key, _ in parsed]
+
+    def stats(self):
+        return {
+            "status": "ok", "cached": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses,
+            "inflight": len(self.inflight), "runs": self.runs,
+        }
+
+
+def _with_hash(key, body):
+    return b'{"input_hash":"' + key.split(":")[0].encode("ascii") + b'",' + body[1:]
+
+
+def _error(message):
+    return json.dumps({"error": message}).encode("utf-8")
+
+
+async def dispatch(service, method, path, body):
+    """(status, JSON bytes) for one request."""
+    if path == "/health":
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, _error("Use GET")
+        return HTTPStatus.OK, json.dumps(service.stats()).encode("utf-8")
+    if path not in ("/feasibility", "/feasibility/batch"):
+        return HTTPStatus.NOT_FOUND, _error(f"No route {path}")
+    if method != "POST":
+        return HTTPStatus.METHOD_NOT_ALLOWED, _error("Use POST")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return HTTPStatus.BAD_REQUEST, _error("Body is not valid JSON")
+
+    if path == "/feasibility":
+        try:
+            parsed = parse_project(payload)
+        except RequestError as exc:
+            return HTTPStatus.BAD_REQUEST, _error(str(exc))
+        (ok, result), = await service.evaluate([parsed])
+        return (HTTPStatus.OK, _with_hash(parsed[0], result)) if ok else (HTTPStatus.BAD_REQUEST, result)
+
+    projects = payload.get("projects") if isinstance(payload, dict) else None
+    if not isinstance(projects, list):
+        return HTTPStatus.BAD_REQUEST, _error("Batch body must be {\"projects\": [...]}")
+    parsed, errors = [], {}
+    for i, item in enumerate(projects):
+        try:
+            parsed.append(parse_project(item))
+        except RequestError as exc:
+            errors[i] = _error(str(exc))
+    results = iter(await service.evaluate(parsed))
+    keys = iter(key for key, _ in parsed)
+    parts = []
+    for i in range(len(projects)):
+        if i in errors:
+            parts.append(errors[i])
+        else:
+            ok, result = next(results)
+            key = next(keys)
+            parts.append(_with_hash(key, result) if ok else result)
+    return HTTPStatus.OK, b'{"results":[' + b",".join(parts) + b"]}"
+
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one connection, honouring keep-alive."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            raw_length = headers.get("content-length") or "0"
+            # digits only: int() would also take "-1", "+1" and "1_000"
+            length = int(raw_length) if raw_length.isascii() and raw_length.isdigit() else None
+            if length is None:  # the body cannot be located, so the connection cannot be reused
+                status, body, keep_alive = HTTPStatus.BAD_REQUEST, _error("Invalid Content-Length"), False
+            elif length > MAX_BODY:
+                status, body, keep_alive = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, _error("Body too large"), False
+            else:
+                data = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    status, body = await dispatch(service, method, target.split("?")[0], data)
+                except Exception as exc:  # answer rather than drop the connection
+                    print(f"{method} {target} failed: {type(exc).__name__}: {exc}", file=sys.stderr)
+                    status, body = HTTPStatus.INTERNAL_SERVER_ERROR, _error(f"Internal error: {type(exc).__name__}")
+
+            writer.write(
+                f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                .encode("latin-1") + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, workers=None, cache_size=4096):
+    service = FeasibilityService(workers, cache_size)
+    server = await asyncio.start_server(partial(handle_connection, service), host, port, backlog=1024)
+    print(f"feasibility API listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve feasibility runs over a local JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-size", type=int, default=4096, help="results kept in the LRU cache")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
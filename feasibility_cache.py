@@ -0,0 +1,208 @@
+# Input-keyed result cache and incremental ledger maintenance
+#
+# Streamlit reruns the whole script on every widget change. ResultCache keeps
+# the artifacts of recent runs keyed on a canonical hash of the inputs, and
+# IncrementalLedger patches only the months a changed unit touches.
+
+import hashlib
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from feasibility import (
+    ACCRUAL_METHODS, MODEL_VERSION, PROJECT_START, UNIT_FIELDS, as_month, assemble_flows, build_draws, construction_cost,
+    ledger_from_flows, sale_months,
+)
+from unit_table import UnitTable
+
+# Engine defaults of the run options; every hash includes them, so passing a
+# default explicitly and leaving it out give the same key
+OPTION_DEFAULTS = {
+    "repay_from_sales": True, "accrual": ACCRUAL_METHODS[0], "start": PROJECT_START, "drawdown": "flat",
+    "equity_first": None,
+}
+
+
+def _canonical(value):
+    if isinstance(value, np.datetime64) or hasattr(value, "isoformat"):
+        return str(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def input_hash(land_price, land_lvr, soft_costs, interest_rate, units, **options):
+    """Stable SHA-256 of the global inputs, unit list, model options and MODEL_VERSION.
+
+    Numbers are canonicalised (1350000.0 and 1350000 hash alike) and unit
+    keys are taken in UNIT_FIELDS order, so equal inputs always collide.
+    ``options`` (e.g. accrual="daily") are folded in by name over
+    OPTION_DEFAULTS; a unit without a label hashes as an empty label.
+    """
+    options = {**OPTION_DEFAULTS, **options}
+    options["start"] = as_month(options["start"])
+    payload = {
+        "model_version": MODEL_VERSION,
+        "land_price": _canonical(land_price),
+        "land_lvr": _canonical(land_lvr),
+        "soft_costs": _canonical(soft_costs),
+        "interest_rate": _canonical(interest_rate),
+        "units": [[_canonical(u.get("label", ""))] + [_canonical(u[k]) for k in UNIT_FIELDS[1:]] for u in units],
+        "options": {k: _canonical(v) for k, v in options.items()},
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU mapping of input hash -> cached run artifacts."""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        entry = self.get(key)
+        if entry is None:
+            entry = compute()
+            self.put(key, entry)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+
+class IncrementalLedger:
+    """Per-month construction draws and sale proceeds, patched as units change.
+
+    Adding, removing or editing units only touches their build months and
+    settlement months; ``ledger()`` then re-derives the cumulative columns.
+    Each batch of edits is one scatter-add, and per-month contributor counts
+    let vacated months snap back to exact zero instead of accumulating float
+    residue. Units are held in a UnitTable. Draws follow the ``drawdown``
+    profile; asking ``ledger()`` for another profile re-spreads every unit.
+    """
+
+    def __init__(self, units=(), drawdown="flat"):
+        self.reset(units, drawdown)
+
+    def reset(self, units, drawdown="flat"):
+        self.drawdown = drawdown
+        self.units = UnitTable()
+        self.draws = np.zeros(2)
+        self.proceeds = np.zeros(2)
+        self._draw_count = np.zeros(2, dtype=np.int64)
+        self._sale_count = np.zeros(2, dtype=np.int64)
+        self.add_units(units)
+
+    @property
+    def n_months(self):
+        if not len(self.units):
+            return 2
+        return int(max(sale_months(self.units.arrays()).max(), 0)) + 2
+
+    def _ensure(self, n_months):
+        extra = n_months - len(self.draws)
+        if extra > 0:
+            self.draws = np.pad(self.draws, (0, extra))
+            self.proceeds = np.pad(self.proceeds, (0, extra))
+            self._draw_count = np.pad(self._draw_count, (0, extra))
+            self._sale_count = np.pad(self._sale_count, (0, extra))
+
+    def _apply(self, table, sign):
+        if not len(table):
+            return
+        cols = table.arrays()
+        sales = sale_months(cols)
+        self._ensure(int(max(sales.max(), 0)) + 2)
+        n = len(self.draws)
+
+        _, months, amounts = build_draws(construction_cost(cols), cols["start"], cols["duration"], self.drawdown)
+        keep = months >= 0
+        self.draws += sign * np.bincount(months[keep], weights=amounts[keep], minlength=n)
+        self._draw_count += sign * np.bincount(months[keep], minlength=n)
+        sold = sales >= 0
+        self.proceeds += sign * np.bincount(sales[sold], weights=cols["sale"][sold], minlength=n)
+        self._sale_count += sign * np.bincount(sales[sold], minlength=n)
+        if sign < 0:
+            self.draws[self._draw_count == 0] = 0.0
+            self.proceeds[self._sale_count == 0] = 0.0
+
+    def add_units(self, units):
+        table = UnitTable.from_records(units)
+        self._apply(table, +1)
+        self.units.append(table)
+
+    def remove_units(self, indices):
+        removed = self.units.remove(indices)
+        self._apply(removed, -1)
+        return removed
+
+    def update_units(self, indices, changes):
+        """Apply ``changes`` ({field: values}) to the units at ``indices``.
+
+        The edited units are built and validated first, so a bad edit leaves
+        the table and the patched draws untouched.
+        """
+        old = self.units.take(indices)
+        new = old.take(slice(None))
+        new.update(np.arange(len(new)), changes)
+        new.arrays()  # raises on invalid units
+        self.units.update(indices, changes)
+        self._apply(old, -1)
+        self._apply(new, +1)
+
+    def add_unit(self, unit):
+        self.add_units([unit])
+
+    def remove_unit(self, index):
+        return self.remove_units([index])[0]
+
+    def update_unit(self, index, unit):
+        self.update_units([index], {k: [unit[k]] for k in UNIT_FIELDS})
+
+    def ledger(self, land_price, land_lvr, soft_costs, interest_rate=0.0,
+               repay_from_sales=True, accrual="monthly", start=PROJECT_START,
+               drawdown="flat", equity_first=None):
+        """Ledger dict matching feasibility.build_ledger for the current units.
+
+        Interest compounds over the whole horizon, so it is re-derived from the
+        patched draws and proceeds rather than patched itself.
+        """
+        if drawdown != self.drawdown:
+            units = self.units  # keep the same table object; callers hold it
+            self.reset((), drawdown)
+            self._apply(units, +1)
+            self.units = units
+        n = self.n_months
+        flows = assemble_flows(
+            self.draws[:n], self.proceeds[:n], land_price, land_lvr, soft_costs,
+            interest_rate=interest_rate, repay_from_sales=repay_from_sales, accrual=accrual, start=start,
+            equity_first=equity_first,
+        )
+        return ledger_from_flows(flows, start)
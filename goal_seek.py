@@ -0,0 +1,115 @@
+# Goal-seek: residual land value and break-even sale price / build rate
+#
+# Every site in a portfolio is solved at once: each bisection step is a single
+# batched scenario_metrics call over all sites. land_price is solved in
+# dollars; sale and rate are solved as a scale factor on every unit's value,
+# so 0.92 means "each unit's sale price may fall 8%".
+
+import numpy as np
+
+from feasibility import GRADE_BANDS, PROJECT_START, scenario_metrics, stack_units
+
+TARGET_METRICS = ("roi_cash", "roi_all", "roi_total")
+# Variable -> does the metric rise as the variable rises?
+SOLVE_VARIABLES = {"land_price": False, "rate": False, "sale": True}
+MAX_EXPANSIONS = 60
+
+
+def grade_floor(grade):
+    """Minimum cash-on-cash ROI (%) that earns ``grade``."""
+    for floor, name, _ in GRADE_BANDS:
+        if name == grade:
+            return float(floor)
+    if grade == "D":
+        return 0.0
+    raise ValueError(f"Unknown deal grade '{grade}'")
+
+
+def _stack(projects):
+    batch = {k: np.array([p[k] for p in projects], dtype=float) for k in ("land_price", "land_lvr", "soft_costs")}
+    batch["interest_rate"] = np.array([p.get("interest_rate", 0.0) for p in projects], dtype=float)
+    batch["cols"] = stack_units([p["units"] for p in projects])
+    return batch
+
+
+def solve(projects, target, variable="land_price", metric="roi_cash", tol=None, max_iter=100,
+          repay_from_sales=True, accrual="monthly", start=PROJECT_START, drawdown="flat", equity_first=None):
+    """Value of ``variable`` per project at which ``metric`` just meets ``target``.
+
+    ``projects`` is a list of dicts with land_price, land_lvr, soft_costs,
+    interest_rate and units. ``target`` is a percentage or a grade letter
+    (graded on roi_cash). Returns a (P,) array: the largest land_price or rate
+    factor, or the smallest sale factor, that still meets the target; NaN
+    where no value can. Assumes the metric is monotonic in the variable.
+    """
+    if variable not in SOLVE_VARIABLES:
+        raise ValueError(f"Cannot solve for '{variable}'; expected one of {tuple(SOLVE_VARIABLES)}")
+    if metric not in TARGET_METRICS:
+        raise ValueError(f"Unknown target metric '{metric}'; expected one of {TARGET_METRICS}")
+    if isinstance(target, str):
+        target, metric = grade_floor(target), "roi_cash"
+    if not projects:
+        return np.empty(0)
+
+    batch = _stack(projects)
+    base_cols = batch["cols"]
+
+    def evaluate(x):
+        land_price, cols = batch["land_price"], base_cols
+        if variable == "land_price":
+            land_price = x
+        else:
+            cols = dict(base_cols, **{variable: base_cols[variable] * x[:, None]})
+        values = scenario_metrics(
+            land_price, batch["land_lvr"], batch["soft_costs"], cols,
+            interest_rate=batch["interest_rate"], repay_from_sales=repay_from_sales, accrual=accrual,
+            start=start, drawdown=drawdown, equity_first=equity_first,
+        )[metric]
+        return np.nan_to_num(values, nan=-np.inf) >= target
+
+    increasing = SOLVE_VARIABLES[variable]
+    n = len(projects)
+    if variable == "land_price":
+        hi = np.maximum(base_cols["sale"].sum(axis=1), 1.0)
+        tol = 1.0 if tol is None else tol
+    else:
+        hi = np.ones(n)
+        tol = 1e-6 if tol is None else tol
+    lo = np.zeros(n)
+
+    # Grow the upper bracket until it sits on the far side of the target
+    for _ in range(MAX_EXPANSIONS):
+        ok_hi = evaluate(hi)
+        grow = ok_hi != increasing
+        if not grow.any():
+            break
+        hi = np.where(grow, hi * 2, hi)
+    feasible = evaluate(hi) if increasing else evaluate(lo)
+    lo = np.where(feasible, lo, hi)  # collapse unsolvable brackets
+
+    # Invariant: the feasible end is lo when decreasing, hi when increasing
+    for _ in range(max_iter):
+        if (hi - lo <= tol).all():
+            break
+        mid = (lo + hi) / 2
+        ok = evaluate(mid)
+        if increasing:
+            hi, lo = np.where(ok, mid, hi), np.where(ok, lo, mid)
+        else:
+            lo, hi = np.where(ok, mid, lo), np.where(ok, hi, mid)
+    return np.where(feasible, hi if increasing else lo, np.nan)
+
+
+def residual_land_value(projects, target, metric="roi_cash", **kwargs):
+    """Maximum land price per project that still meets the target ROI."""
+    return solve(projects, target, "land_price", metric, **kwargs)
+
+
+def min_sale_factor(projects, target, metric="roi_cash", **kwargs):
+    """Smallest scale on every unit's sale price that still meets the target."""
+    return solve(projects, target, "sale", metric, **kwargs)
+
+
+def max_rate_factor(projects, target, metric="roi_cash", **kwargs):
+    """Largest scale on every unit's build cost per m² that still meets the target."""
+    return solve(projects, target, "rate", metric, **kwargs)
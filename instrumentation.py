@@ -0,0 +1,128 @@
+# Per-stage run instrumentation: wall time, allocations and row counts
+#
+# A RunTimings collects one record per stage of a feasibility run and logs
+# each as a JSON line on the "feasibility.perf" logger. Allocation tracking
+# uses tracemalloc and is off by default, since tracing slows allocation-heavy
+# code. profile_call runs one call under cProfile and tracemalloc for a
+# detailed look at a single slow run.
+
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger("feasibility.perf")
+PROFILE_LINES = 25
+
+
+def enable_json_logs(stream=None, path=None):
+    """Send perf records to ``path`` or ``stream`` (default stderr), one JSON object per line.
+
+    Safe to call on every Streamlit rerun; the handler is only added once.
+    """
+    if any(getattr(h, "_perf_json", False) for h in logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler._perf_json = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+class RunTimings:
+    """Stage records for one run.
+
+    Each record holds the stage name, wall seconds, row count and, with
+    ``track_memory``, bytes still allocated at the end of the stage and the
+    peak above its starting point. Stages must not be nested.
+    """
+
+    def __init__(self, run_id=None, track_memory=False):
+        self.run_id = run_id
+        self.track_memory = track_memory
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the enclosed block; set ``record["rows"]`` inside it if unknown up front."""
+        record = {"stage": name, "rows": rows}
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - t0
+            if self.track_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record["alloc_bytes"] = current - before
+                record["peak_bytes"] = peak - before
+            if started_tracing:
+                tracemalloc.stop()
+            self._record(record)
+
+    def add(self, name, seconds, rows=None):
+        """Record a stage timed elsewhere (e.g. from the start of a script rerun)."""
+        self._record({"stage": name, "rows": rows, "seconds": seconds})
+
+    def _record(self, record):
+        self.stages.append(record)
+        logger.info(json.dumps({"event": "stage", "run": self.run_id, **record}))
+
+    @property
+    def total_seconds(self):
+        return sum(r["seconds"] for r in self.stages)
+
+    def summary(self):
+        """Run-level record (also logged), with stage seconds keyed by name."""
+        record = {
+            "event": "run", "run": self.run_id, "seconds": self.total_seconds,
+            "stages": {r["stage"]: r["seconds"] for r in self.stages},
+        }
+        logger.info(json.dumps(record))
+        return record
+
+    def table(self):
+        """Columns for display: stage, ms, rows and (when tracked) KiB allocated / peak."""
+        columns = {
+            "Stage": [r["stage"] for r in self.stages],
+            "Time (ms)": [round(r["seconds"] * 1000, 2) for r in self.stages],
+            "Rows": [r["rows"] for r in self.stages],
+        }
+        if self.track_memory:
+            columns["Alloc (KiB)"] = [round(r.get("alloc_bytes", 0) / 1024, 1) for r in self.stages]
+            columns["Peak (KiB)"] = [round(r.get("peak_bytes", 0) / 1024, 1) for r in self.stages]
+        return columns
+
+
+def profile_call(fn, *args, limit=PROFILE_LINES, **kwargs):
+    """Run ``fn`` under cProfile and tracemalloc.
+
+    Returns (result, report) where report["cpu"] is the top ``limit``
+    functions by cumulative time and report["memory"] the top ``limit``
+    allocation sites still alive when the call returned.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(fn, *args, **kwargs)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    cpu = io.StringIO()
+    pstats.Stats(profiler, stream=cpu).sort_stats("cumulative").print_stats(limit)
+    memory = "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:limit])
+    return result, {"cpu": cpu.getvalue(), "memory": memory}
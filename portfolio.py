@@ -0,0 +1,183 @@
+# Portfolio consolidation: many projects on one calendar against shared limits
+#
+#   python portfolio.py --db feasibility.db --scenario Base \
+#       --facility-limit 25000000 --equity-cap 12000000 --output portfolio.csv
+#
+# Each project's funded flows come from its event ledger, evaluated at its
+# own event dates and period starts. Those per-project streams are already
+# date-sorted, so consolidation is a k-way merge of the streams followed by
+# running sums of every project's cash and loan-balance changes. The
+# combined position is exact at every event date. The calendar table reports
+# each period's closing and peak positions and flags periods where the
+# combined loan balance exceeds the shared debt facility or combined equity
+# exceeds the shared equity cap.
+
+import argparse
+import sys
+
+import numpy as np
+
+from event_ledger import RESOLUTIONS, period_labels, period_starts, project_events
+from feasibility import PROJECT_START
+
+PORTFOLIO_COLUMNS = [
+    "Period", "Date", "Period Name", "Cash Out ($)", "Cumulative Cash ($)", "Loan Balance ($)",
+    "Net Cash Position ($)", "Peak Cash ($)", "Peak Loan ($)", "Facility Breach", "Equity Breach",
+]
+PROJECT_COLUMNS = [
+    "Project", "Peak Cash ($)", "Peak Loan ($)", "Cash At Portfolio Peak ($)", "Loan At Portfolio Peak ($)",
+    "Facility Breach Periods", "Equity Breach Periods",
+]
+
+
+def project_stream(project, resolution="monthly"):
+    """(dates, cash, loan balance change) for one project at its events and period starts.
+
+    ``project`` is a scenario dict as stored by project_store (land_price,
+    land_lvr, soft_costs, interest_rate, units and optional start, drawdown,
+    equity_first, repay_from_sales and settlement_days).
+    """
+    events = project_events(
+        project["land_price"], project["soft_costs"], project["units"], project.get("start", PROJECT_START),
+        project.get("drawdown", "flat"), project.get("settlement_days"),
+    )
+    dates, flows = events.flows(
+        project["land_lvr"], project["interest_rate"], project.get("repay_from_sales", True),
+        project.get("equity_first"), grid=period_starts(events.dates[0], events.dates[-1], resolution),
+    )
+    return dates, flows["cash"], np.diff(flows["balance"], prepend=0.0)
+
+
+def merge_streams(dates):
+    """Merge k date-sorted arrays: (merged dates, order into their concatenation, owning stream).
+
+    A stable sort over the concatenated runs (timsort) merges the presorted
+    runs, and ties keep stream order.
+    """
+    merged = np.concatenate(dates)
+    order = np.argsort(merged, kind="stable")
+    owner = np.repeat(np.arange(len(dates)), [len(d) for d in dates])[order]
+    return merged[order], order, owner
+
+
+def _level(dates, values, at, side="right"):
+    """Step series (``values`` from each of ``dates`` on) at ``at``, or just before it with side="left"."""
+    idx = np.searchsorted(dates, at, side=side) - 1
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], 0.0)
+
+
+def consolidate(projects, facility_limit=None, equity_cap=None, resolution="monthly", names=None):
+    """Combined cash and debt position of ``projects`` on one calendar.
+
+    Returns a dict with ``table`` (PORTFOLIO_COLUMNS per period), ``projects``
+    (PROJECT_COLUMNS per project) and the headline figures: peak combined
+    cash and its date, peak exposure (cash plus debt) with its date and
+    period label, peak loan balance and the number of breach periods.
+    """
+    if not projects:
+        raise ValueError("A portfolio needs at least one project")
+    names = list(names) if names is not None else [p.get("name") or f"Project {i + 1}" for i, p in enumerate(projects)]
+    streams = [project_stream(p, resolution) for p in projects]
+    first = min(s[0][0] for s in streams)
+    last = max(s[0][-1] for s in streams)
+    periods = period_starts(first, last, resolution)
+
+    # The calendar joins the merge as a zero-flow stream so every period has a close
+    dates, order, _ = merge_streams([s[0] for s in streams] + [periods])
+    zeros = np.zeros(len(periods))
+    cash = np.concatenate([s[1] for s in streams] + [zeros])[order]
+    balance = np.cumsum(np.concatenate([s[2] for s in streams] + [zeros])[order])
+    cum_cash = np.cumsum(cash)
+    close = np.r_[dates[1:] != dates[:-1], True]  # last entry on each date
+    when, cum_cash, balance = dates[close], cum_cash[close], balance[close]
+    balance = np.where(np.abs(balance) < 1e-6, 0.0, balance)
+
+    bounds = np.searchsorted(when, periods)
+    ends = np.r_[bounds[1:] - 1, len(when) - 1]
+    period_cash = np.diff(cum_cash[ends], prepend=0.0)
+    peak_cash = np.maximum.reduceat(cum_cash, bounds)
+    peak_loan = np.maximum.reduceat(balance, bounds)
+    facility_breach = peak_loan > facility_limit if facility_limit is not None else np.zeros(len(periods), bool)
+    equity_breach = peak_cash > equity_cap if equity_cap is not None else np.zeros(len(periods), bool)
+    table = {
+        "Period": np.arange(len(periods)),
+        "Date": periods,
+        "Period Name": period_labels(periods, resolution),
+        "Cash Out ($)": period_cash,
+        "Cumulative Cash ($)": cum_cash[ends],
+        "Loan Balance ($)": balance[ends],
+        "Net Cash Position ($)": cum_cash[ends] - balance[ends],
+        "Peak Cash ($)": peak_cash,
+        "Peak Loan ($)": peak_loan,
+        "Facility Breach": facility_breach,
+        "Equity Breach": equity_breach,
+    }
+
+    exposure = cum_cash + balance
+    i_cash, i_exposure = int(np.argmax(cum_cash)), int(np.argmax(exposure))
+    exposure_period = int(np.searchsorted(periods, when[i_exposure], side="right") - 1)
+
+    # Each project's closing levels per period (to attribute breaches) and at the portfolio peaks
+    next_starts = np.r_[periods[1:], np.datetime64("9999-12-31")]
+    project_rows = {col: [] for col in PROJECT_COLUMNS}
+    for name, (p_dates, p_cash, p_dbal) in zip(names, streams):
+        p_cum, p_bal = np.cumsum(p_cash), np.cumsum(p_dbal)
+        project_rows["Project"].append(name)
+        project_rows["Peak Cash ($)"].append(float(p_cum.max()))
+        project_rows["Peak Loan ($)"].append(float(p_bal.max()))
+        project_rows["Cash At Portfolio Peak ($)"].append(float(_level(p_dates, p_cum, when[i_cash])))
+        project_rows["Loan At Portfolio Peak ($)"].append(float(_level(p_dates, p_bal, when[i_exposure])))
+        project_rows["Facility Breach Periods"].append(
+            int((facility_breach & (_level(p_dates, p_bal, next_starts, "left") > 1e-6)).sum()))
+        project_rows["Equity Breach Periods"].append(
+            int((equity_breach & (_level(p_dates, p_cum, next_starts, "left") > 0)).sum()))
+
+    return {
+        "table": table,
+        "projects": project_rows,
+        "peak_cash": float(cum_cash[i_cash]),
+        "peak_cash_date": when[i_cash],
+        "peak_exposure": float(exposure[i_exposure]),
+        "peak_exposure_date": when[i_exposure],
+        "peak_exposure_period": str(table["Period Name"][exposure_period]),
+        "peak_loan": float(balance.max()),
+        "facility_breaches": int(facility_breach.sum()),
+        "equity_breaches": int(equity_breach.sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consolidate stored projects against shared funding limits.")
+    parser.add_argument("--db", default=None, help="project store (default: $FEASIBILITY_DB or feasibility.db)")
+    parser.add_argument("--scenario", default="Base", help="scenario to take from each project")
+    parser.add_argument("--facility-limit", type=float, help="shared debt facility limit ($)")
+    parser.add_argument("--equity-cap", type=float, help="shared equity cap ($)")
+    parser.add_argument("--resolution", choices=RESOLUTIONS, default="monthly")
+    parser.add_argument("--output", help="CSV, Parquet or Excel file for the period table")
+    args = parser.parse_args(argv)
+
+    from export import table_chunks, write_chunks
+    from project_store import DEFAULT_PATH, ProjectStore
+
+    scenarios = [sc for sc in ProjectStore(args.db or DEFAULT_PATH).load_scenarios() if sc["name"] == args.scenario]
+    if not scenarios:
+        print(f"No projects have a '{args.scenario}' scenario", file=sys.stderr)
+        return 1
+    result = consolidate(
+        scenarios, args.facility_limit, args.equity_cap, args.resolution, names=[sc["project"] for sc in scenarios],
+    )
+    print(f"{len(scenarios)} projects")
+    print(f"peak combined cash ${result['peak_cash']:,.0f} on {result['peak_cash_date']}")
+    print(f"peak exposure ${result['peak_exposure']:,.0f} in {result['peak_exposure_period']}")
+    print(f"breach periods: facility {result['facility_breaches']}, equity {result['equity_breaches']}")
+    if args.output:
+        record = {
+            "scenario": args.scenario, "projects": [sc["project"] for sc in scenarios],
+            "facility_limit": args.facility_limit, "equity_cap": args.equity_cap, "resolution": args.resolution,
+        }
+        write_chunks(table_chunks(result["table"]), args.output, record)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
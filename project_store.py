@@ -0,0 +1,277 @@
+# SQLite-backed store for projects, scenarios, units and computed results
+#
+# A project holds named scenarios; each scenario is one set of global inputs
+# plus its unit list. Results are keyed by input hash, so any run whose
+# inputs match a stored one (from the app, the batch CLI or the API) can
+# reuse it instead of recomputing. Bulk writes run in a single transaction.
+
+import io
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from feasibility import LEDGER_COLUMNS, UNIT_FIELDS, month_labels, run_feasibility
+from feasibility_cache import OPTION_DEFAULTS, input_hash
+
+DEFAULT_PATH = os.environ.get("FEASIBILITY_DB", "feasibility.db")
+OPTION_KEYS = tuple(OPTION_DEFAULTS)
+MAX_STORED_LEDGERS = 2000  # newest results keep their ledger; older ones keep metrics only
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    land_price REAL NOT NULL,
+    land_lvr REAL NOT NULL,
+    soft_costs REAL NOT NULL,
+    interest_rate REAL NOT NULL,
+    options TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    UNIQUE (project_id, name)
+);
+CREATE INDEX IF NOT EXISTS scenarios_input_hash ON scenarios(input_hash);
+CREATE TABLE IF NOT EXISTS units (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    size REAL NOT NULL,
+    rate REAL NOT NULL,
+    cont REAL NOT NULL,
+    start INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    sale REAL NOT NULL,
+    PRIMARY KEY (scenario_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (
+    input_hash TEXT PRIMARY KEY,
+    metrics TEXT NOT NULL,
+    ledger BLOB,
+    created TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _now(timespec="seconds"):
+    return datetime.now(timezone.utc).isoformat(timespec=timespec)
+
+
+def _pack_ledger(ledger):
+    """Numeric ledger columns as compressed .npz bytes (labels are re-derived)."""
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **{f"c{i}": np.asarray(ledger[col]) for i, col in enumerate(LEDGER_COLUMNS)
+                                if col != "Month Name"})
+    return buf.getvalue()
+
+
+def _unpack_ledger(blob, start=None):
+    with np.load(io.BytesIO(blob)) as data:
+        ledger = {col: data[f"c{i}"] for i, col in enumerate(LEDGER_COLUMNS) if col != "Month Name"}
+    n = len(ledger["Month"])
+    ledger["Month Name"] = month_labels(n) if start is None else month_labels(n, start)
+    return {col: ledger[col] for col in LEDGER_COLUMNS}
+
+
+def scenario_hash(scenario):
+    """Input hash of a scenario dict (land_price, ..., units, optional options)."""
+    return input_hash(
+        scenario["land_price"], scenario["land_lvr"], scenario["soft_costs"],
+        scenario["interest_rate"], scenario["units"],
+        **{k: scenario[k] for k in OPTION_KEYS if k in scenario},
+    )
+
+
+class ProjectStore:
+    """Projects, scenarios and hash-keyed results in one SQLite file.
+
+    Connections are opened per operation, so one store object can be shared
+    across Streamlit sessions and threads; WAL mode lets readers proceed
+    while a writer commits.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            with conn:  # one transaction per operation
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Projects and scenarios ---
+    def save_scenarios(self, scenarios):
+        """Insert or replace many scenarios (with their units) in one transaction.
+
+        Each scenario dict has project, name, land_price, land_lvr, soft_costs,
+        interest_rate, units and any of the OPTION_KEYS settings.
+        Returns the scenario ids in order.
+        """
+        ids = []
+        now = _now()
+        with self._connect() as conn:
+            for sc in scenarios:
+                conn.execute("INSERT OR IGNORE INTO projects (name, created) VALUES (?, ?)", (sc["project"], now))
+                project_id = conn.execute("SELECT id FROM projects WHERE name = ?", (sc["project"],)).fetchone()[0]
+                options = json.dumps({k: str(sc[k]) if k == "start" else sc[k] for k in OPTION_KEYS if k in sc})
+                row = (
+                    project_id, sc["name"], float(sc["land_price"]), float(sc["land_lvr"]),
+                    float(sc["soft_costs"]), float(sc["interest_rate"]), options, scenario_hash(sc), now,
+                )
+                conn.execute(
+                    "INSERT INTO scenarios (project_id, name, land_price, land_lvr, soft_costs, interest_rate,"
+                    " options, input_hash, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (project_id, name) DO UPDATE SET land_price = excluded.land_price,"
+                    " land_lvr = excluded.land_lvr, soft_costs = excluded.soft_costs,"
+                    " interest_rate = excluded.interest_rate, options = excluded.options,"
+                    " input_hash = excluded.input_hash, updated = excluded.updated",
+                    row,
+                )
+                # RETURNING needs SQLite 3.35; look the id up instead
+                scenario_id = conn.execute(
+                    "SELECT id FROM scenarios WHERE project_id = ? AND name = ?", (project_id, sc["name"]),
+                ).fetchone()[0]
+                conn.execute("DELETE FROM units WHERE scenario_id = ?", (scenario_id,))
+                conn.executemany(
+                    "INSERT INTO units (scenario_id, position, label, size, rate, cont, start, duration, sale)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (scenario_id, i, str(u["label"]), float(u["size"]), float(u["rate"]), float(u["cont"]),
+                         int(u["start"]), int(u["duration"]), float(u["sale"]))
+                        for i, u in enumerate(sc["units"])
+                    ],
+                )
+                ids.append(scenario_id)
+        return ids
+
+    def save_scenario(self, project, name, land_price, land_lvr, soft_costs, interest_rate, units, **options):
+        return self.save_scenarios([{
+            "project": project, "name": name, "land_price": land_price, "land_lvr": land_lvr,
+            "soft_costs": soft_costs, "interest_rate": interest_rate, "units": units, **options,
+        }])[0]
+
+    def load_scenarios(self, project=None):
+        """All scenarios (optionally for one project) with units, as dicts."""
+        query = (
+            "SELECT s.id, p.name, s.name, s.land_price, s.land_lvr, s.soft_costs, s.interest_rate, s.options"
+            " FROM scenarios s JOIN projects p ON p.id = s.project_id"
+        )
+        args = ()
+        if project is not None:
+            query += " WHERE p.name = ?"
+            args = (project,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY p.name, s.name", args).fetchall()
+            units = {}
+            unit_query = "SELECT scenario_id, " + ", ".join(UNIT_FIELDS) + " FROM units"
+            if project is not None:
+                unit_query += " WHERE scenario_id IN (SELECT s.id FROM scenarios s JOIN projects p" \
+                              " ON p.id = s.project_id WHERE p.name = ?)"
+            for r in conn.execute(unit_query + " ORDER BY scenario_id, position", args):
+                units.setdefault(r[0], []).append(dict(zip(UNIT_FIELDS, r[1:])))
+        return [
+            {
+                "id": sid, "project": proj, "name": name, "land_price": lp, "land_lvr": lvr,
+                "soft_costs": soft, "interest_rate": rate, "units": units.get(sid, []), **json.loads(options),
+            }
+            for sid, proj, name, lp, lvr, soft, rate, options in rows
+        ]
+
+    def load_scenario(self, project, name):
+        for sc in self.load_scenarios(project):
+            if sc["name"] == name:
+                return sc
+        raise KeyError(f"No scenario '{name}' in project '{project}'")
+
+    def list_projects(self):
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT name FROM projects ORDER BY name")]
+
+    def list_scenarios(self, project):
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute(
+                "SELECT s.name FROM scenarios s JOIN projects p ON p.id = s.project_id"
+                " WHERE p.name = ? ORDER BY s.name", (project,),
+            )]
+
+    def delete_scenario(self, project, name):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM scenarios WHERE name = ? AND project_id = (SELECT id FROM projects WHERE name = ?)",
+                (name, project),
+            )
+
+    # --- Results ---
+    def put_results(self, results):
+        """Store many (input_hash, metrics, ledger-or-None) results in one transaction.
+
+        Only the newest MAX_STORED_LEDGERS ledgers are kept; older results
+        drop theirs and are served as metrics only.
+        """
+        now = _now("microseconds")  # orders results written within the same second
+        results = list(results)
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (input_hash, metrics, ledger, created) VALUES (?, ?, ?, ?)",
+                [
+                    (key, json.dumps(metrics), None if ledger is None else _pack_ledger(ledger), now)
+                    for key, metrics, ledger in results
+                ],
+            )
+            if any(ledger is not None for _, _, ledger in results):
+                conn.execute(
+                    "UPDATE results SET ledger = NULL WHERE ledger IS NOT NULL AND input_hash NOT IN"
+                    " (SELECT input_hash FROM results WHERE ledger IS NOT NULL ORDER BY created DESC LIMIT ?)",
+                    (MAX_STORED_LEDGERS,),
+                )
+
+    def get_metrics(self, hashes):
+        """Stored metrics for the given input hashes, as {hash: metrics}."""
+        hashes = list(hashes)
+        found = {}
+        with self._connect() as conn:
+            for lo in range(0, len(hashes), 500):  # stay under SQLite's variable limit
+                batch = hashes[lo:lo + 500]
+                marks = ",".join("?" * len(batch))
+                for key, metrics in conn.execute(
+                    f"SELECT input_hash, metrics FROM results WHERE input_hash IN ({marks})", batch,
+                ):
+                    found[key] = json.loads(metrics)
+        return found
+
+    def get_result(self, key, start=None):
+        """(metrics, ledger) stored under ``key``; ledger is None if not kept."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT metrics, ledger FROM results WHERE input_hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), None if row[1] is None else _unpack_ledger(row[1], start)
+
+    def run(self, scenario, keep_ledger=True):
+        """Metrics and ledger for a scenario, reusing a stored result when the hash matches."""
+        key = scenario_hash(scenario)
+        cached = self.get_result(key, scenario.get("start"))
+        if cached is not None and (cached[1] is not None or not keep_ledger):
+            return {"metrics": cached[0], "ledger": cached[1], "input_hash": key, "cached": True}
+        result = run_feasibility(
+            scenario["land_price"], scenario["land_lvr"], scenario["soft_costs"], scenario["interest_rate"],
+            scenario["units"], **{k: scenario[k] for k in OPTION_KEYS if k in scenario},
+        )
+        self.put_results([(key, result["metrics"], result["ledger"] if keep_ledger else None)])
+        return {**result, "input_hash": key, "cached": False}
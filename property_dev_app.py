@@ -1,25 +1,169 @@
 
 # Rebuilding complete multi-unit MVP app with UI, summary, and chart
 
+import json
+import time
+from datetime import date
+
+import numpy as np
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+
+from charts import cashflow_png, chart_data, heatmap_png, heatmap_spec
+from drawdown import DRAWDOWN_PROFILES
+from event_ledger import RESOLUTIONS, project_events
+from export import export_bytes, ledger_chunks, provenance, table_chunks
+from feasibility import ACCRUAL_METHODS, UNIT_FIELDS, as_month, compute_metrics, month_labels
+from feasibility_cache import IncrementalLedger, ResultCache, input_hash
+from portfolio import consolidate
+from instrumentation import RunTimings, enable_json_logs, profile_call
+from goal_seek import TARGET_METRICS, max_rate_factor, min_sale_factor, residual_land_value
+from project_store import ProjectStore
+from returns import DEFAULT_DISCOUNT_RATE, ledger_returns
+from risk import simulate
+from staging import STAGING_OBJECTIVES, optimise_staging
+from sensitivity import (
+    RETURN_SURFACE_METRICS, SENSITIVITY_INPUTS, SURFACE_METRICS, default_values, sensitivity_grid, tornado,
+)
+from unit_table import UnitTable
+
+UNIT_PAGE_SIZE = 100  # rows per page of the unit grid
+FUNDING_MODES = ("Pro rata (30% equity / 70% loan)", "Equity first")
+STAGING_TIME_BUDGET = 3.0  # seconds; the search runs inside the script rerun
 
 st.set_page_config(layout="wide")
 st.title("🏗️ Property Development Feasibility App (Multi-Unit MVP)")
 
 if "units" not in st.session_state:
     st.session_state.units = []
+# The incremental ledger owns the unit table; rebuild it if units were replaced
+if "ledger" not in st.session_state or st.session_state.ledger.units is not st.session_state.units:
+    st.session_state.ledger = IncrementalLedger(st.session_state.units)
+    st.session_state.units = st.session_state.ledger.units
+if "result_cache" not in st.session_state:
+    st.session_state.result_cache = ResultCache(maxsize=16)
+
+# Global inputs live in session state so a loaded scenario can set them
+GLOBAL_DEFAULTS = {
+    "land_price": 1350000, "land_lvr": 0.7, "interest_pct": 6.5, "accrual": ACCRUAL_METHODS[0],
+    "repay_from_sales": True, "soft_costs": 80000, "project_start": date(2025, 3, 1),
+    "drawdown": DRAWDOWN_PROFILES[0], "funding": FUNDING_MODES[0], "construction_equity": 500000,
+}
+for key, value in GLOBAL_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
+
+
+@st.cache_resource
+def get_store():
+    return ProjectStore()
+
+
+store = get_store()
+
+
+def load_scenario(project, name):
+    sc = store.load_scenario(project, name)
+    st.session_state.units = sc["units"]
+    st.session_state.land_price = sc["land_price"]
+    st.session_state.land_lvr = sc["land_lvr"]
+    st.session_state.interest_pct = sc["interest_rate"] * 100
+    st.session_state.soft_costs = sc["soft_costs"]
+    st.session_state.accrual = sc.get("accrual", ACCRUAL_METHODS[0])
+    st.session_state.repay_from_sales = sc.get("repay_from_sales", True)
+    if "start" in sc:
+        st.session_state.project_start = date.fromisoformat(sc["start"] + "-01")
+    st.session_state.drawdown = sc.get("drawdown", DRAWDOWN_PROFILES[0])
+    if sc.get("equity_first") is None:
+        st.session_state.funding = FUNDING_MODES[0]
+    else:
+        st.session_state.funding = FUNDING_MODES[1]
+        st.session_state.construction_equity = sc["equity_first"]
+
 
 # --- Sidebar: Global Inputs ---
+inputs_started = time.perf_counter()
 st.sidebar.header("Global Inputs")
-land_price = st.sidebar.number_input("Land Price ($)", value=1350000)
-land_lvr = st.sidebar.slider("Land LVR", 0.0, 1.0, 0.7)
-interest_rate = st.sidebar.number_input("Interest Rate (%)", value=6.5) / 100
-soft_costs = st.sidebar.number_input("Soft Costs ($)", value=80000)
-start_offset = st.sidebar.number_input("Initial Start Month", value=3)
+land_price = st.sidebar.number_input("Land Price ($)", key="land_price")
+land_lvr = st.sidebar.slider("Land LVR", 0.0, 1.0, key="land_lvr")
+interest_rate = st.sidebar.number_input("Interest Rate (%)", key="interest_pct") / 100
+accrual = st.sidebar.selectbox("Interest Accrual", ACCRUAL_METHODS, key="accrual")
+repay_from_sales = st.sidebar.checkbox("Repay Loan From Sale Proceeds", key="repay_from_sales")
+soft_costs = st.sidebar.number_input("Soft Costs ($)", key="soft_costs")
+start_offset = st.sidebar.number_input("Initial Start Month", min_value=0, value=3)
+project_start = as_month(st.sidebar.date_input("Project Start", key="project_start"))
+drawdown = st.sidebar.selectbox("Drawdown Profile", DRAWDOWN_PROFILES, key="drawdown")
+funding = st.sidebar.radio("Construction Funding", FUNDING_MODES, key="funding")
+equity_first = None
+if funding == FUNDING_MODES[1]:
+    equity_first = st.sidebar.number_input("Construction Equity ($)", min_value=0, key="construction_equity")
+options = {
+    "repay_from_sales": repay_from_sales, "accrual": accrual, "start": project_start,
+    "drawdown": drawdown, "equity_first": equity_first,
+}
+inputs_seconds = time.perf_counter() - inputs_started
+discount_rate = st.sidebar.number_input("Discount Rate (% p.a.)", value=DEFAULT_DISCOUNT_RATE * 100) / 100
+chart_mode = st.sidebar.radio("Chart Mode", ["Native (fast)", "Static image"])
+
+with st.sidebar.expander("💾 Projects"):
+    store_project = st.text_input("Project", value="Default")
+    store_scenario = st.text_input("Scenario", value="Base")
+    if st.button("💾 Save Scenario", disabled=not st.session_state.units):
+        store.save_scenario(
+            store_project, store_scenario, land_price, land_lvr, soft_costs, interest_rate,
+            st.session_state.units, **options,
+        )
+        st.success(f"Saved {store_project} / {store_scenario}")
+    saved = [(p, s) for p in store.list_projects() for s in store.list_scenarios(p)]
+    if saved:
+        chosen = st.selectbox("Saved Scenarios", saved, format_func=lambda ps: f"{ps[0]} / {ps[1]}")
+        st.button("📂 Load Scenario", on_click=load_scenario, args=chosen)
+
+perf_panel = st.sidebar.expander("⏱️ Performance")
+with perf_panel:
+    show_perf = st.checkbox("Record Stage Timings")
+    track_memory = st.checkbox("Track Allocations", disabled=not show_perf)
+    profile_next = st.checkbox("Profile Next Run (cProfile + tracemalloc)")
+if show_perf:
+    enable_json_logs()
+
+with st.sidebar.expander("📐 Sensitivity"):
+    sens_x = st.selectbox("X Axis Input", SENSITIVITY_INPUTS, index=SENSITIVITY_INPUTS.index("land_price"))
+    sens_y = st.selectbox("Y Axis Input", SENSITIVITY_INPUTS, index=SENSITIVITY_INPUTS.index("sale"))
+    sens_metric = st.selectbox("Surface Metric", SURFACE_METRICS + RETURN_SURFACE_METRICS)
+    sens_swing = st.slider("Sweep Range (±)", 0.05, 0.5, 0.2)
+    sens_steps = st.slider("Grid Steps", 10, 200, 50)
+
+with st.sidebar.expander("🎲 Risk Simulation"):
+    risk_sims = st.select_slider("Simulations", [10_000, 100_000, 250_000, 500_000, 1_000_000], value=100_000)
+    risk_seed = st.number_input("Random Seed", value=42, step=1)
+    run_risk = st.button("🎲 Run Risk Simulation")
+
+with st.sidebar.expander("🗓️ Event Ledger"):
+    event_resolution = st.selectbox("Resolution", RESOLUTIONS)
+    settle_on_day = st.checkbox("Settle Sales A Set Number Of Days After Completion")
+    settlement_days = st.number_input("Settlement Days", min_value=0, value=42, disabled=not settle_on_day)
+
+with st.sidebar.expander("🏢 Portfolio"):
+    portfolio_picks = st.multiselect(
+        "Projects", [(p, s) for p in store.list_projects() for s in store.list_scenarios(p)],
+        format_func=lambda ps: f"{ps[0]} / {ps[1]}",
+    )
+    facility_limit = st.number_input("Shared Debt Facility ($, 0 = none)", min_value=0, value=0, step=1_000_000)
+    equity_cap = st.number_input("Shared Equity Cap ($, 0 = none)", min_value=0, value=0, step=1_000_000)
+    run_portfolio = st.button("🏢 Consolidate Portfolio", disabled=not portfolio_picks)
+
+with st.sidebar.expander("🧩 Unit Staging"):
+    staging_objective = st.selectbox(
+        "Objective", STAGING_OBJECTIVES,
+        format_func=lambda o: {"peak_cash": "Minimise Peak Cash", "roi_cash": "Maximise Cash-on-Cash ROI"}[o],
+    )
+    staging_earliest = st.number_input("Earliest Start Month", min_value=0, value=0)
+    staging_concurrent = st.number_input("Max Concurrent Builds (0 = any)", min_value=0, value=0)
+    staging_cap = st.number_input("Equity Cap ($, 0 = none)", min_value=0, value=0, step=100_000)
+    run_staging = st.button("🧩 Optimise Staging", disabled=not st.session_state.units)
+
+with st.sidebar.expander("🎯 Goal Seek"):
+    seek_metric = st.selectbox("Target Metric", TARGET_METRICS)
+    seek_target = st.number_input("Target ROI (%)", value=20.0)
 
 # --- Add New Unit ---
 with st.expander("➕ Add Unit"):
@@ -27,123 +171,360 @@ with st.expander("➕ Add Unit"):
     size = st.number_input("Build Size (m²)", value=120)
     rate = st.number_input("Cost per m² ($)", value=2000)
     cont = st.slider("Contingency (%)", 0.0, 0.3, 0.1)
-    start = st.number_input("Start Month", value=start_offset)
+    start = st.number_input("Start Month", min_value=0, value=start_offset)
     dur = st.number_input("Build Duration (months)", value=9)
     sale = st.number_input("Sale Price ($)", value=850000)
     if st.button("Add Unit"):
-        st.session_state.units.append({
+        st.session_state.ledger.add_unit({
             "label": label, "size": size, "rate": rate, "cont": cont,
             "start": int(start), "duration": int(dur), "sale": sale
         })
 
+# --- Import Units ---
+with st.expander("📥 Import Units From CSV"):
+    upload = st.file_uploader(
+        "Units CSV", type="csv", help="Columns: size, rate, cont, start, duration, sale and optionally label",
+    )
+    if upload is not None and st.button("Import Units"):
+        try:
+            st.session_state.ledger.add_units(UnitTable.from_csv(upload))
+        except (KeyError, ValueError, TypeError) as exc:
+            st.error(f"Could not import units: {exc}")
+
+
+def apply_unit_edits(editor_key, offset):
+    """Apply one page's grid edits as a single batch of updates, removals and additions."""
+    edits = st.session_state[editor_key]
+    ledger = st.session_state.ledger
+    try:
+        added = UnitTable.from_records(edits["added_rows"])
+        if edits["edited_rows"]:
+            rows = sorted(edits["edited_rows"])
+            merged = [{**ledger.units[offset + r], **edits["edited_rows"][r]} for r in rows]
+            ledger.update_units([offset + r for r in rows], {k: [u[k] for u in merged] for k in UNIT_FIELDS})
+        if edits["deleted_rows"]:
+            ledger.remove_units([offset + r for r in edits["deleted_rows"]])
+        ledger.add_units(added)
+    except (KeyError, ValueError, TypeError) as exc:
+        st.session_state.unit_error = f"Could not apply unit changes: {exc}"
+    st.session_state.editor_version += 1  # rebuild the grid from the updated table
+
+
 # --- Show Units ---
+st.session_state.setdefault("editor_version", 0)
+grid_started = time.perf_counter()
 if st.session_state.units:
     st.subheader("📋 Units In Project")
-    for i, u in enumerate(st.session_state.units):
-        with st.expander(f"{u['label']}"):
-            st.markdown(f"- Size: {u['size']} m²")
-            st.markdown(f"- Rate: ${u['rate']:,.0f}")
-            st.markdown(f"- Contingency: {u['cont']*100:.1f}%")
-            st.markdown(f"- Start: Month {u['start']}")
-            st.markdown(f"- Duration: {u['duration']} months")
-            st.markdown(f"- Sale: ${u['sale']:,.0f}")
-            if st.button(f"Remove {u['label']}", key=f"rm_{i}"):
-                st.session_state.units.pop(i)
-                st.experimental_rerun()
+    units = st.session_state.units
+    n_pages = -(-len(units) // UNIT_PAGE_SIZE)
+    st.session_state.unit_page = min(st.session_state.get("unit_page", 1), n_pages)
+    page = st.number_input(f"Page (of {n_pages})", 1, n_pages, key="unit_page") if n_pages > 1 else 1
+    offset = (page - 1) * UNIT_PAGE_SIZE
+    editor_key = f"unit_editor_{st.session_state.editor_version}"
+    st.data_editor(
+        units.frame(offset, offset + UNIT_PAGE_SIZE), key=editor_key, num_rows="dynamic",
+        column_config={
+            "size": st.column_config.NumberColumn("Size (m²)", min_value=0),
+            "rate": st.column_config.NumberColumn("Rate ($/m²)", format="$%d", min_value=0),
+            "cont": st.column_config.NumberColumn("Contingency", min_value=0.0, max_value=1.0),
+            "start": st.column_config.NumberColumn("Start Month", min_value=0, step=1),
+            "duration": st.column_config.NumberColumn("Duration (months)", min_value=1, step=1),
+            "sale": st.column_config.NumberColumn("Sale ($)", format="$%d", min_value=0),
+        },
+    )
+    st.button("✅ Apply Unit Changes", on_click=apply_unit_edits, args=(editor_key, offset))
+    if "unit_error" in st.session_state:
+        st.error(st.session_state.pop("unit_error"))
+grid_seconds = time.perf_counter() - grid_started
+
+# --- Unit Staging ---
+def apply_staging():
+    proposal = st.session_state.pop("staging")
+    units = st.session_state.ledger.units
+    if len(units) != len(proposal["starts"]):
+        st.session_state.unit_error = "Units changed since staging was optimised; run it again."
+        return
+    st.session_state.ledger.update_units(np.arange(len(units)), {"start": proposal["starts"]})
+    st.session_state.editor_version += 1
+
+
+if run_staging and st.session_state.units:
+    with st.spinner("Searching start-month schedules..."):
+        st.session_state.staging = optimise_staging(
+            {"land_price": land_price, "land_lvr": land_lvr, "soft_costs": soft_costs,
+             "interest_rate": interest_rate, "units": st.session_state.units, **options},
+            staging_objective, earliest=int(staging_earliest), max_concurrent=staging_concurrent or None,
+            equity_cap=staging_cap or None, time_budget=STAGING_TIME_BUDGET,
+        )
+if "staging" in st.session_state:
+    proposal = st.session_state.staging
+    before, after = proposal["initial"], proposal["metrics"]
+    st.subheader("🧩 Proposed Unit Staging")
+    if not proposal["feasible"]:
+        st.warning("⚠️ No schedule found within the constraints; showing the closest one.")
+    st.markdown(
+        f"- **Peak Cash:** ${before['peak_cash']:,.0f} → ${after['peak_cash']:,.0f}\n"
+        f"- **Cash-on-Cash ROI:** {before['roi_cash']:.1f}% → {after['roi_cash']:.1f}%\n"
+        f"- **Max Concurrent Builds:** {before['max_concurrent']:.0f} → {after['max_concurrent']:.0f}\n"
+        f"- **Search:** {proposal['rounds']} moves, {proposal['restarts']} restarts, "
+        f"{proposal['evaluations']:,} schedules evaluated"
+    )
+    st.caption(
+        f"Best local optimum found within a {STAGING_TIME_BUDGET:.0f} s search: no single start change or swap "
+        "improves it, but a better schedule may exist."
+    )
+    if len(proposal["starts"]) == len(st.session_state.units):
+        st.dataframe({
+            "Unit": [u["label"] for u in st.session_state.units],
+            "Current Start": [u["start"] for u in st.session_state.units],
+            "Proposed Start": proposal["starts"],
+        }, hide_index=True)
+    st.button("✅ Apply Staged Starts", on_click=apply_staging)
 
 # --- Run Feasibility ---
 if st.button("🚀 Run Feasibility") and st.session_state.units:
     units = st.session_state.units
-    cash_months, loan_months = {}, {}
-    equity_land = land_price * (1 - land_lvr)
-    loan_land = land_price * land_lvr
-    cash_months[0] = equity_land + soft_costs
-    loan_months[0] = loan_land
-
-    for u in units:
-        base = u["size"] * u["rate"]
-        cont_val = u["cont"] * base
-        total = base + cont_val
-        per_month = total / u["duration"]
-        for m in range(u["start"], u["start"] + u["duration"]):
-            cash_months[m] = cash_months.get(m, 0) + per_month * 0.3
-            loan_months[m] = loan_months.get(m, 0) + per_month * 0.7
-        sale_m = u["start"] + u["duration"] + 1
-        cash_months[sale_m] = cash_months.get(sale_m, 0) - u["sale"]
-
-    max_month = max(max(cash_months), max(loan_months))
-    cashflow = {
-        "Month": [], "Month Name": [], "Cash Out ($)": [], "Loan In ($)": [],
-        "Cumulative Cash ($)": [], "Loan Balance ($)": [], "Net Cash Position ($)": []
-    }
 
-    cum_cash = cum_loan = 0
-    for m in range(max_month + 2):
-        label = (datetime(2025, 3, 1) + relativedelta(months=m)).strftime("%b-%Y")
-        cash = cash_months.get(m, 0)
-        loan = loan_months.get(m, 0)
-        cum_cash += cash
-        cum_loan += loan
-        cashflow["Month"].append(m)
-        cashflow["Month Name"].append(label)
-        cashflow["Cash Out ($)"].append(cash)
-        cashflow["Loan In ($)"].append(loan)
-        cashflow["Cumulative Cash ($)"].append(cum_cash)
-        cashflow["Loan Balance ($)"].append(cum_loan)
-        cashflow["Net Cash Position ($)"].append(cum_cash - cum_loan)
-
-    df = pd.DataFrame(cashflow)
-
-    sale_months = [u["start"] + u["duration"] + 1 for u in units]
-    first_sale_month = min(sale_months)
-    first_sale_index = df[df["Month"] == first_sale_month].index[0]
-    total_project_cost = df["Cumulative Cash ($)"].iloc[first_sale_index - 1] + df["Loan Balance ($)"].iloc[first_sale_index - 1]
-    total_revenue = sum(u["sale"] for u in units)
-    gross_profit = total_revenue - total_project_cost
-    peak_cash = df["Cumulative Cash ($)"].max()
-    roi_cash = (gross_profit / peak_cash) * 100
-    roi_total = (gross_profit / total_project_cost) * 100
-
-    total_construction = sum((u["size"] * u["rate"]) * (1 + u["cont"]) for u in units)
-    full_cost = land_price + soft_costs + total_construction
-    profit_all = total_revenue - full_cost
-    roi_all = profit_all / full_cost * 100
-
-    grade, color = "F", "🟥"
-    if roi_cash >= 80: grade, color = "A+", "🟢"
-    elif roi_cash >= 60: grade, color = "A", "🟢"
-    elif roi_cash >= 40: grade, color = "B", "🟡"
-    elif roi_cash >= 20: grade, color = "C", "🟠"
-    elif roi_cash > 0: grade, color = "D", "🔴"
+    run_key = input_hash(land_price, land_lvr, soft_costs, interest_rate, units, **options)
+    timings = RunTimings(run_key[:12], track_memory=show_perf and track_memory)
+    timings.add("inputs", inputs_seconds)
+    timings.add("unit grid", grid_seconds, rows=min(len(units), UNIT_PAGE_SIZE))
+
+    def compute_run():
+        # Session cache first, then results persisted by earlier sessions
+        with timings.stage("store lookup"):
+            stored = store.get_result(run_key, project_start)
+        if stored is not None and stored[1] is not None:
+            metrics, ledger = stored
+        else:
+            with timings.stage("ledger") as rec:
+                ledger = st.session_state.ledger.ledger(land_price, land_lvr, soft_costs, interest_rate, **options)
+                rec["rows"] = len(ledger["Month"])
+            with timings.stage("metrics", rows=len(units)):
+                metrics = compute_metrics(ledger, units, land_price, soft_costs)
+            with timings.stage("store save"):
+                store.put_results([(run_key, metrics, ledger)])
+        with timings.stage("csv", rows=len(ledger["Month"])):
+            csv = export_bytes(ledger_chunks(ledger), "csv")
+        return {"ledger": ledger, "metrics": metrics, "csv": csv}
+
+    profile_report = None
+    if profile_next:
+        run, profile_report = profile_call(compute_run)
+        st.session_state.result_cache.put(run_key, run)
+    else:
+        # A hit skips every compute stage, so record it as a stage of its own
+        with timings.stage("cache miss") as rec:
+            run = st.session_state.result_cache.get(run_key)
+            if run is not None:
+                rec["stage"] = "cache hit"
+        if run is None:
+            run = compute_run()
+            st.session_state.result_cache.put(run_key, run)
+    m = run["metrics"]
 
     st.subheader("🧮 Project Profitability Summary")
-    st.markdown(f"- **Total Revenue:** ${total_revenue:,.0f}")
+    st.markdown(f"- **Total Revenue:** ${m['total_revenue']:,.0f}")
     st.markdown(f"- **Land Cost:** ${land_price:,.0f}")
     st.markdown(f"- **Soft Costs:** ${soft_costs:,.0f}")
-    st.markdown(f"- **Construction (incl. contingency):** ${total_construction:,.0f}")
-    st.markdown(f"- **All-In Project Cost:** ${full_cost:,.0f}")
-    st.markdown(f"- **Gross Profit (All-In):** ${profit_all:,.0f}")
-    st.markdown(f"- **ROI (All-In):** {roi_all:.1f}%")
+    st.markdown(f"- **Construction (incl. contingency):** ${m['total_construction']:,.0f}")
+    st.markdown(f"- **Finance Costs (capitalised interest):** ${m['interest_cost']:,.0f}")
+    st.markdown(f"- **All-In Project Cost:** ${m['full_cost']:,.0f}")
+    st.markdown(f"- **Gross Profit (All-In):** ${m['profit_all']:,.0f}")
+    st.markdown(f"- **ROI (All-In):** {m['roi_all']:.1f}%")
 
     st.subheader("📊 Timing-Based Feasibility")
-    st.markdown(f"- **Total Sale Value:** ${total_revenue:,.0f}")
-    st.markdown(f"- **Total Project Cost (timed):** ${total_project_cost:,.0f}")
-    st.markdown(f"- **Gross Profit:** ${gross_profit:,.0f}")
-    st.markdown(f"- **ROI on Cost:** {roi_total:.1f}%")
-    st.markdown(f"- **Cash-on-Cash ROI:** {roi_cash:.1f}%")
-    st.markdown(f"- **Peak Cash Invested:** ${peak_cash:,.0f}")
-    st.markdown(f"- **Deal Grade:** `{grade}` {color}")
-
-    st.subheader("📈 Cashflow Chart")
-    fig, ax = plt.subplots(figsize=(14, 6))
-    ax.plot(df["Month Name"], df["Cumulative Cash ($)"], label="Cash Invested", marker="o")
-    ax.plot(df["Month Name"], df["Loan Balance ($)"], label="Loan", marker="x")
-    ax.plot(df["Month Name"], df["Net Cash Position ($)"], label="Net Position", linestyle="--", color="purple")
-    ax.set_xticks(df["Month Name"][::2])
-    ax.set_xticklabels(df["Month Name"][::2], rotation=45)
-    ax.grid(True)
-    ax.legend()
-    st.pyplot(fig)
-
-    csv = df.to_csv(index=False).encode("utf-8")
-    st.download_button("📥 Download Cashflow CSV", data=csv, file_name="cashflow.csv", mime="text/csv")
+    st.markdown(f"- **Total Sale Value:** ${m['total_revenue']:,.0f}")
+    st.markdown(f"- **Total Project Cost (timed):** ${m['total_project_cost']:,.0f}")
+    st.markdown(f"- **Gross Profit:** ${m['gross_profit']:,.0f}")
+    st.markdown(f"- **ROI on Cost:** {m['roi_total']:.1f}%")
+    st.markdown(f"- **Cash-on-Cash ROI:** {m['roi_cash']:.1f}%")
+    st.markdown(f"- **Peak Cash Invested:** ${m['peak_cash']:,.0f}")
+    st.markdown(f"- **Deal Grade:** `{m['grade']}` {m['color']}")
+
+    with timings.stage("returns", rows=len(run["ledger"]["Month"])):
+        r = ledger_returns(run["ledger"], discount_rate)
+
+    def fmt_rate(value):
+        return "n/a" if value != value else f"{value:.1f}%"
+
+    st.subheader("💹 Time-Value Returns")
+    st.markdown(f"- **Project IRR (unlevered):** {fmt_rate(r['project_irr'])}")
+    st.markdown(f"- **Equity IRR:** {fmt_rate(r['equity_irr'])}")
+    st.markdown(f"- **Project NPV @ {discount_rate * 100:.1f}%:** ${r['project_npv']:,.0f}")
+    st.markdown(f"- **Equity NPV @ {discount_rate * 100:.1f}%:** ${r['equity_npv']:,.0f}")
+    st.markdown(f"- **Equity Multiple:** {r['equity_multiple']:.2f}x")
+    if r["payback_month"] != r["payback_month"]:
+        st.markdown("- **Payback:** not reached")
+    else:
+        payback = int(r["payback_month"])
+        st.markdown(f"- **Payback:** month {payback} ({month_labels(payback + 1, project_start)[-1]})")
+
+    base = {
+        "land_price": land_price, "land_lvr": land_lvr, "soft_costs": soft_costs,
+        "interest_rate": interest_rate, "units": st.session_state.units, **options,
+    }
+    with timings.stage("goal seek", rows=3):
+        rlv = residual_land_value([base], seek_target, seek_metric, **options)[0]
+        sale_x = min_sale_factor([base], seek_target, seek_metric, **options)[0]
+        rate_x = max_rate_factor([base], seek_target, seek_metric, **options)[0]
+
+    def fmt_solution(value, template):
+        return "not achievable" if value != value else template.format(value)
+
+    st.subheader(f"🎯 Goal Seek ({seek_metric} ≥ {seek_target:.1f}%)")
+    st.markdown("- **Residual Land Value:** " + fmt_solution(rlv, "${:,.0f}"))
+    st.markdown("- **Minimum Sale Price:** " + fmt_solution(sale_x * 100, "{:.1f}% of each unit's sale price"))
+    st.markdown("- **Maximum Build Rate:** " + fmt_solution(rate_x * 100, "{:.1f}% of each unit's cost per m²"))
+
+    chart_col, sens_col = st.columns([3, 2])
+
+    with chart_col:
+        st.subheader("📈 Cashflow Chart")
+        with timings.stage("chart", rows=len(run["ledger"]["Month"])):
+            if chart_mode == "Static image":
+                st.image(cashflow_png(run["ledger"]))
+            else:
+                st.line_chart(chart_data(run["ledger"]), x="Month")
+
+    with sens_col:
+        st.subheader("🌡️ Sensitivity Heatmap")
+        if sens_x == sens_y:
+            st.warning("⚠️ Pick two different sensitivity inputs.")
+        else:
+            xs = default_values(base, sens_x, sens_steps, sens_swing)
+            ys = default_values(base, sens_y, sens_steps, sens_swing)
+            with timings.stage("sensitivity", rows=sens_steps * sens_steps):
+                surface = sensitivity_grid(
+                    base, sens_x, xs, sens_y, ys, metrics=(sens_metric,),
+                    discount_rate=discount_rate if sens_metric in RETURN_SURFACE_METRICS else None,
+                )[sens_metric]
+            with timings.stage("heatmap", rows=surface.size):
+                if chart_mode == "Static image":
+                    st.image(heatmap_png(surface, xs, ys, sens_x, sens_y, sens_metric))
+                else:
+                    st.vega_lite_chart(*heatmap_spec(surface, xs, ys, sens_x, sens_y, sens_metric))
+
+        st.markdown("**Tornado (±10%, Cash-on-Cash ROI)**")
+        with timings.stage("tornado"):
+            st.dataframe(tornado(base), hide_index=True)
+
+    record = provenance(land_price, land_lvr, soft_costs, interest_rate, units, **options)
+    csv_col, other_col, inputs_col = st.columns(3)
+    with csv_col:
+        st.download_button("📥 Download Cashflow CSV", data=run["csv"], file_name="cashflow.csv", mime="text/csv")
+    with other_col:
+        export_fmt = st.selectbox("Other Format", ["parquet", "excel"], label_visibility="collapsed")
+        try:
+            data = export_bytes(ledger_chunks(run["ledger"]), export_fmt, record)
+        except ImportError as exc:
+            st.caption(f"⚠️ {exc}")
+        else:
+            ext = {"parquet": "parquet", "excel": "xlsx"}[export_fmt]
+            st.download_button(f"📥 Download Cashflow .{ext}", data=data, file_name=f"cashflow.{ext}")
+    with inputs_col:
+        st.download_button(
+            "📥 Download Inputs JSON", data=json.dumps(record, indent=2, default=str),
+            file_name="cashflow.inputs.json", mime="application/json",
+        )
+
+    with st.expander(f"🗓️ Event Ledger ({event_resolution}, daily interest)"):
+        with timings.stage("event ledger") as rec:
+            events = project_events(
+                land_price, soft_costs, units, project_start, drawdown,
+                settlement_days=int(settlement_days) if settle_on_day else None,
+            )
+            view = events.view(land_lvr, interest_rate, event_resolution, repay_from_sales, equity_first)
+            event_metrics = events.metrics(land_lvr, interest_rate, repay_from_sales, equity_first)
+            rec["rows"] = len(view["Period"])
+        st.markdown(
+            f"- **Events:** {len(events):,} ({events.nbytes / 1024:,.1f} KiB) → {len(view['Period']):,} rows\n"
+            f"- **Cash-on-Cash ROI:** {event_metrics['roi_cash']:.1f}%\n"
+            f"- **Peak Cash Invested:** ${event_metrics['peak_cash']:,.0f}\n"
+            f"- **Finance Costs:** ${event_metrics['interest_cost']:,.0f}"
+        )
+        st.dataframe(view, hide_index=True)
+        st.download_button(
+            f"📥 Download {event_resolution.title()} Ledger CSV", data=export_bytes(table_chunks(view), "csv"),
+            file_name=f"cashflow_{event_resolution}.csv", mime="text/csv",
+        )
+
+    if show_perf:
+        summary = timings.summary()
+        with perf_panel:
+            st.markdown(f"**Last run:** {summary['seconds'] * 1000:,.0f} ms")
+            st.dataframe(timings.table(), hide_index=True)
+    if profile_report is not None:
+        with st.expander("🔬 Profile Of This Run"):
+            st.markdown("**CPU (cProfile, cumulative)**")
+            st.code(profile_report["cpu"])
+            st.markdown("**Live allocations (tracemalloc)**")
+            st.code(profile_report["memory"])
+
+# --- Risk Simulation ---
+if run_risk and st.session_state.units:
+    base = {
+        "land_price": land_price, "land_lvr": land_lvr, "soft_costs": soft_costs,
+        "interest_rate": interest_rate, "units": st.session_state.units, **options,
+    }
+    risk = simulate(base, n_sims=risk_sims, seed=int(risk_seed), discount_rate=discount_rate)
+
+    st.subheader("🎲 Risk Simulation")
+    st.markdown(f"- **Simulations:** {risk['n_sims']:,} (seed {risk['seed']})")
+    st.markdown(
+        f"- **Cash-on-Cash ROI P10 / P50 / P90:** {risk['roi_cash']['p10']:.1f}% / "
+        f"{risk['roi_cash']['p50']:.1f}% / {risk['roi_cash']['p90']:.1f}%"
+    )
+    st.markdown(
+        f"- **All-In ROI P10 / P50 / P90:** {risk['roi_all']['p10']:.1f}% / "
+        f"{risk['roi_all']['p50']:.1f}% / {risk['roi_all']['p90']:.1f}%"
+    )
+    st.markdown(
+        f"- **Equity IRR P10 / P50 / P90:** {risk['equity_irr']['p10']:.1f}% / "
+        f"{risk['equity_irr']['p50']:.1f}% / {risk['equity_irr']['p90']:.1f}%"
+    )
+    st.markdown(f"- **Probability of Loss:** {risk['prob_loss'] * 100:.1f}%")
+    st.markdown(
+        f"- **Peak Cash P10 / P50 / P90:** ${risk['peak_cash']['p10']:,.0f} / "
+        f"${risk['peak_cash']['p50']:,.0f} / ${risk['peak_cash']['p90']:,.0f}"
+    )
+
+    grade_col, peak_col = st.columns(2)
+    with grade_col:
+        st.markdown("**Deal Grade Distribution**")
+        st.bar_chart({"Share": risk["grades"]})
+    with peak_col:
+        st.markdown("**Peak Cash Distribution**")
+        hist = risk["peak_cash_hist"]
+        counts = hist.counts.reshape(64, -1).sum(axis=1)
+        mids = hist.edges()[:-1].reshape(64, -1)[:, 0]
+        st.bar_chart({"Peak Cash ($)": mids.round(-3), "Simulations": counts}, x="Peak Cash ($)", y="Simulations")
+
+# --- Portfolio ---
+if run_portfolio and portfolio_picks:
+    scenarios = [store.load_scenario(p, s) for p, s in portfolio_picks]
+    portfolio = consolidate(
+        scenarios, facility_limit or None, equity_cap or None, names=[f"{p} / {s}" for p, s in portfolio_picks],
+    )
+    table = portfolio["table"]
+
+    st.subheader(f"🏢 Portfolio ({len(scenarios)} projects)")
+    st.markdown(
+        f"- **Peak Combined Equity:** ${portfolio['peak_cash']:,.0f} on {portfolio['peak_cash_date']}\n"
+        f"- **Peak Exposure (equity + debt):** ${portfolio['peak_exposure']:,.0f} in "
+        f"{portfolio['peak_exposure_period']}\n"
+        f"- **Peak Loan Balance:** ${portfolio['peak_loan']:,.0f}\n"
+        f"- **Facility Breach Months:** {portfolio['facility_breaches']}\n"
+        f"- **Equity Cap Breach Months:** {portfolio['equity_breaches']}"
+    )
+    if portfolio["facility_breaches"] or portfolio["equity_breaches"]:
+        breached = table["Facility Breach"] | table["Equity Breach"]
+        st.warning("⚠️ Shared limits breached in " + ", ".join(table["Period Name"][breached][:24])
+                   + (" …" if breached.sum() > 24 else ""))
+    st.line_chart(
+        {"Month": table["Period"], "Cumulative Cash": table["Cumulative Cash ($)"],
+         "Loan Balance": table["Loan Balance ($)"]},
+        x="Month",
+    )
+    st.dataframe(portfolio["projects"], hide_index=True)
+    st.dataframe(table, hide_index=True)
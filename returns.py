@@ -0,0 +1,188 @@
+# Time-value returns: IRR, NPV, equity multiple and payback from monthly flows
+#
+# Every function works on (S, n_months) cashflow arrays, so a sensitivity
+# grid, a Monte Carlo batch or a portfolio chunk is solved in one pass.
+#
+# IRR is found in x = ln(1 + monthly rate), where NPV is a sum of
+# exponentials. NPV is first evaluated on a fixed grid of rates, which for
+# every row at once is a single matrix product, to bracket a root. Where the
+# flows change sign more than once and NPV has several roots, the bracket
+# where NPV falls through zero (rises, for flows that open with an inflow)
+# nearest IRR_GUESS is taken. Safeguarded Newton steps then refine every row
+# together, falling back to bisection whenever a step leaves its bracket.
+# Rates are annualised and reported in percent like the ROI metrics.
+
+import numpy as np
+
+from feasibility import broadcast_scenarios, derive_metrics, ledger_flows, sale_months, stack_units
+
+DEFAULT_DISCOUNT_RATE = 0.10  # annual, for NPV
+IRR_GUESS = 0.10  # annual; picks the root when NPV has several
+IRR_RANGE = (-0.99, 100.0)  # annual rates searched for a sign change
+IRR_GRID = 128
+IRR_TOL = 1e-10  # NPV tolerance, relative to the gross flows
+IRR_MAX_ITER = 60
+RETURN_METRICS = ("project_irr", "equity_irr", "project_npv", "equity_npv", "equity_multiple", "payback_month")
+
+
+def equity_cashflows(flows, last=None):
+    """Investor cashflows (distributions positive) from ledger flows.
+
+    Equity receives the negative of ``cash``; any loan still outstanding at
+    each row's ``last`` month is repaid from equity then. Months after
+    ``last`` are zeroed.
+    """
+    cf = -np.atleast_2d(np.asarray(flows["cash"], dtype=float))
+    balance = np.atleast_2d(flows["balance"])
+    last = _last(cf, last)
+    rows = np.arange(cf.shape[0])
+    cf = np.where(np.arange(cf.shape[1]) <= last[:, None], cf, 0.0)
+    cf[rows, last] -= balance[rows, last]
+    return cf
+
+
+def project_cashflows(flows, last=None):
+    """Unlevered cashflows: sale proceeds less land, soft and construction costs."""
+    cf = -np.atleast_2d(np.asarray(flows["cash"], dtype=float) + flows["loan"] - flows["repaid"])
+    return np.where(np.arange(cf.shape[1]) <= _last(cf, last)[:, None], cf, 0.0)
+
+
+def _last(cf, last):
+    if last is None:
+        return np.full(cf.shape[0], cf.shape[1] - 1)
+    return np.broadcast_to(np.asarray(last, dtype=np.int64), (cf.shape[0],))
+
+
+def npv(cf, rate=DEFAULT_DISCOUNT_RATE):
+    """Net present value at month 0 of monthly ``cf`` (..., n) at an annual ``rate``."""
+    cf = np.asarray(cf, dtype=float)
+    t = np.arange(cf.shape[-1])
+    rate = np.asarray(rate, dtype=float)[..., None]
+    return (cf * (1 + rate) ** (-t / 12)).sum(axis=-1)
+
+
+def irr(cf, guess=IRR_GUESS, tol=IRR_TOL, max_iter=IRR_MAX_ITER):
+    """Annual IRR (%) of each row of monthly cashflows ``cf`` (S, n).
+
+    NaN where no rate in IRR_RANGE sets NPV to zero (e.g. flows that never
+    change sign).
+    """
+    cf = np.atleast_2d(np.asarray(cf, dtype=float))
+    n_rows, n = cf.shape
+    t = np.arange(n, dtype=float)
+    scale = np.abs(cf).sum(axis=1)
+    scale[scale == 0] = 1.0
+
+    # Bracket: NPV on a rate grid for every row is one matrix product
+    grid = np.linspace(*np.log1p(IRR_RANGE) / 12, IRR_GRID)
+    with np.errstate(over="ignore"):
+        values = cf @ np.exp(-np.outer(t, grid))
+    crossing = values[:, :-1] * values[:, 1:] <= 0
+    # Prefer roots where NPV falls through zero for flows that open with an
+    # outflow (rises for ones that open with an inflow), nearest the guess
+    opens_out = cf[np.arange(n_rows), (cf != 0).argmax(axis=1)] < 0
+    falling = values[:, :-1] >= values[:, 1:]
+    preferred = crossing & (falling == opens_out[:, None])
+    crossing = np.where(preferred.any(axis=1)[:, None], preferred, crossing)
+    mid = (grid[:-1] + grid[1:]) / 2
+    pick = np.where(crossing, np.abs(mid - np.log1p(guess) / 12), np.inf).argmin(axis=1)
+    found = crossing[np.arange(n_rows), pick] & (cf > 0).any(axis=1) & (cf < 0).any(axis=1)
+    lo, hi = grid[pick], grid[pick + 1]
+    f_lo = values[np.arange(n_rows), pick]
+
+    # Refine: Newton in x = ln(1 + r), bisecting when a step leaves the bracket
+    x = (lo + hi) / 2
+    active = found.copy()
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        xa = x[active]
+        disc = np.exp(-np.outer(xa, t))
+        f = (cf[active] * disc).sum(axis=1)
+        df = -(cf[active] * disc * t).sum(axis=1)
+        same = np.sign(f) == np.sign(f_lo[active])
+        lo_a = np.where(same, xa, lo[active])
+        hi_a = np.where(same, hi[active], xa)
+        f_lo[active] = np.where(same, f, f_lo[active])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = xa - f / df
+        inside = np.isfinite(step) & (step > lo_a) & (step < hi_a)
+        x[active] = np.where(inside, step, (lo_a + hi_a) / 2)
+        lo[active], hi[active] = lo_a, hi_a
+        done = (np.abs(f) <= tol * scale[active]) | (hi_a - lo_a <= 1e-15)
+        x[np.flatnonzero(active)[done]] = xa[done]
+        active[np.flatnonzero(active)[done]] = False
+    return np.where(found, np.expm1(12 * x) * 100, np.nan)
+
+
+def equity_multiple(cf):
+    """Total distributions over total contributions for each row of ``cf``."""
+    cf = np.atleast_2d(cf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.maximum(cf, 0).sum(axis=1) / np.maximum(-cf, 0).sum(axis=1)
+
+
+def payback_month(cf):
+    """First month from which cumulative ``cf`` stays non-negative; NaN if it never does."""
+    cum = np.cumsum(np.atleast_2d(cf), axis=1)
+    negative = cum < -1e-6
+    last_negative = np.where(negative.any(axis=1), cum.shape[1] - 1 - negative[:, ::-1].argmax(axis=1), -1)
+    month = (last_negative + 1).astype(float)
+    return np.where(month < cum.shape[1], month, np.nan)
+
+
+def return_metrics(flows, discount_rate=DEFAULT_DISCOUNT_RATE, last=None):
+    """RETURN_METRICS as (S,) arrays from (S, n_months) ledger flows.
+
+    ``flows`` needs ``cash``, ``loan``, ``repaid`` and ``balance``; ``last``
+    is each row's final ledger month when rows are padded to a common horizon.
+    """
+    equity = equity_cashflows(flows, last)
+    project = project_cashflows(flows, last)
+    return {
+        "project_irr": irr(project),
+        "equity_irr": irr(equity),
+        "project_npv": npv(project, discount_rate),
+        "equity_npv": npv(equity, discount_rate),
+        "equity_multiple": equity_multiple(equity),
+        "payback_month": payback_month(equity),
+    }
+
+
+def ledger_returns(ledger, discount_rate=DEFAULT_DISCOUNT_RATE):
+    """RETURN_METRICS as floats for one project's ledger dict."""
+    flows = {
+        "cash": ledger["Cash Out ($)"], "loan": ledger["Loan In ($)"],
+        "repaid": ledger["Loan Repaid ($)"], "balance": ledger["Loan Balance ($)"],
+    }
+    return {k: float(v[0]) for k, v in return_metrics(flows, discount_rate).items()}
+
+
+def scenario_returns(land_price, land_lvr, soft_costs, cols, discount_rate=DEFAULT_DISCOUNT_RATE, **kwargs):
+    """Deal metrics plus RETURN_METRICS for a batch of scenarios as (S,) arrays.
+
+    Arguments are as for feasibility.scenario_metrics. Each scenario's
+    cashflows end the month after its last sale, where any loan still
+    outstanding is repaid from equity.
+    """
+    (land_price, land_lvr, soft_costs), c = broadcast_scenarios(land_price, land_lvr, soft_costs, cols)
+    flows = ledger_flows(land_price, land_lvr, soft_costs, c, **kwargs)
+    last = sale_months(c).max(axis=-1) + 1
+    return {**derive_metrics(flows, c, land_price, soft_costs), **return_metrics(flows, discount_rate, last)}
+
+
+def project_returns(projects, discount_rate=DEFAULT_DISCOUNT_RATE, **kwargs):
+    """RETURN_METRICS as (P,) arrays for a list of projects, solved as one batch.
+
+    ``projects`` are dicts of land_price, land_lvr, soft_costs, interest_rate
+    and units; ``kwargs`` (repay_from_sales, accrual, start, drawdown,
+    equity_first) apply to every project.
+    """
+    if not projects:
+        return {k: np.empty(0) for k in RETURN_METRICS}
+    batch = {k: np.array([p[k] for p in projects], dtype=float) for k in ("land_price", "land_lvr", "soft_costs")}
+    metrics = scenario_returns(
+        batch["land_price"], batch["land_lvr"], batch["soft_costs"], stack_units([p["units"] for p in projects]),
+        discount_rate, interest_rate=np.array([p.get("interest_rate", 0.0) for p in projects], dtype=float), **kwargs,
+    )
+    return {k: metrics[k] for k in RETURN_METRICS}
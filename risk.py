@@ -0,0 +1,185 @@
+# Monte Carlo risk simulation of deal outcomes
+#
+# Uncertain inputs are drawn per simulated project in vectorized batches from
+# a seeded generator. Per-unit inputs (sale, rate, cont, duration) are drawn
+# as scale factors shared by every unit in the project; interest_rate is
+# drawn as an absolute rate. Results stream into fixed-size histograms, so
+# memory does not grow with the number of iterations.
+
+import numpy as np
+
+from feasibility import GRADE_BANDS, deal_grades
+from sensitivity import SENSITIVITY_INPUTS, evaluate
+
+GRADES = [g for _, g, _ in GRADE_BANDS] + ["D", "F"]
+
+# Spec tuples: ("fixed", v), ("uniform", low, high), ("normal", mean, sd),
+# ("triangular", low, mode, high)
+DEFAULT_DISTRIBUTIONS = {
+    "sale": ("triangular", 0.90, 1.00, 1.05),
+    "rate": ("triangular", 0.95, 1.00, 1.15),
+    "cont": ("uniform", 0.50, 1.50),
+    "duration": ("triangular", 0.90, 1.00, 1.30),
+}
+INTEREST_RATE_SD = 0.0075
+TAIL_PERCENTILE = 0.1  # first-batch percentile beyond which values start in the exact tails
+
+
+def default_distributions(base):
+    """DEFAULT_DISTRIBUTIONS plus a normal interest rate around the base rate."""
+    return {**DEFAULT_DISTRIBUTIONS, "interest_rate": ("normal", base["interest_rate"], INTEREST_RATE_SD)}
+
+
+def draw(rng, spec, n):
+    kind, *params = spec
+    if kind == "fixed":
+        return np.full(n, float(params[0]))
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1], n)
+    if kind == "normal":
+        return rng.normal(params[0], params[1], n)
+    if kind == "triangular":
+        return rng.triangular(params[0], params[1], params[2], n)
+    raise ValueError(f"Unknown distribution '{kind}'")
+
+
+class StreamingHistogram:
+    """Fixed-bin histogram of the bulk of the values, with exact outlier tails.
+
+    The binned range starts at the first batch's TAIL_PERCENTILE span.
+    Values outside it are kept exactly in a low or high tail, so a few far
+    outliers cannot stretch the bins. Once a tail holds more than
+    ``tail_size`` values, the range doubles towards it. Doubling merges
+    adjacent bin pairs, so counts stay exact. Memory stays at ``bins``
+    counters plus at most ``tail_size`` values per tail. Quantiles are exact
+    in the tails and accurate to ``bin_width()`` inside the binned range.
+    """
+
+    def __init__(self, bins=4096, tail_size=4096):
+        self.bins = bins
+        self.tail_size = tail_size
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.low_tail = np.empty(0)
+        self.high_tail = np.empty(0)
+        self.lo = self.hi = None
+        self.n = 0
+        self.total = 0.0
+
+    def _double(self, downward):
+        half = self.bins // 2
+        width = self.hi - self.lo
+        merged = self.counts.reshape(half, 2).sum(axis=1)
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        if downward:
+            self.counts[half:] = merged
+            self.lo -= width
+        else:
+            self.counts[:half] = merged
+            self.hi += width
+
+    def _bin(self, values):
+        idx = ((values - self.lo) / (self.hi - self.lo) * self.bins).astype(np.int64)
+        self.counts += np.bincount(np.clip(idx, 0, self.bins - 1), minlength=self.bins)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return
+        if self.lo is None:
+            lo, hi = np.percentile(values, [TAIL_PERCENTILE, 100 - TAIL_PERCENTILE])
+            self.lo = lo
+            self.hi = hi + max(abs(hi - lo), abs(hi), 1.0) * 1e-6
+        low, high = values < self.lo, values >= self.hi
+        self._bin(values[~(low | high)])
+        self.low_tail = np.concatenate([self.low_tail, values[low]])
+        self.high_tail = np.concatenate([self.high_tail, values[high]])
+        while len(self.low_tail) > self.tail_size:
+            self._double(downward=True)
+            inside = self.low_tail >= self.lo
+            self._bin(self.low_tail[inside])
+            self.low_tail = self.low_tail[~inside]
+        while len(self.high_tail) > self.tail_size:
+            self._double(downward=False)
+            inside = self.high_tail < self.hi
+            self._bin(self.high_tail[inside])
+            self.high_tail = self.high_tail[~inside]
+        self.n += values.size
+        self.total += values.sum()
+
+    def bin_width(self):
+        return float((self.hi - self.lo) / self.bins) if self.n else float("nan")
+
+    def quantile(self, q):
+        if not self.n:
+            return float("nan")
+        target = q * self.n
+        if target < len(self.low_tail):
+            return float(np.sort(self.low_tail)[int(target)])
+        target -= len(self.low_tail)
+        cum = np.cumsum(self.counts)
+        if target >= cum[-1] and len(self.high_tail):
+            return float(np.sort(self.high_tail)[min(int(target - cum[-1]), len(self.high_tail) - 1)])
+        i = min(int(np.searchsorted(cum, target)), self.bins - 1)
+        before = cum[i - 1] if i else 0
+        frac = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        return float(self.lo + (i + frac) * (self.hi - self.lo) / self.bins)
+
+    def mean(self):
+        return float(self.total / self.n) if self.n else float("nan")
+
+    def edges(self):
+        """Bin edges of ``counts``; tail values lie outside them."""
+        return np.linspace(self.lo, self.hi, self.bins + 1)
+
+    def summary(self):
+        return {
+            "p10": self.quantile(0.10), "p50": self.quantile(0.50),
+            "p90": self.quantile(0.90), "mean": self.mean(), "bin_width": self.bin_width(),
+        }
+
+
+def simulate(base, distributions=None, n_sims=100_000, batch_size=50_000, seed=0, discount_rate=None):
+    """Simulate ``n_sims`` projects and return streamed outcome statistics.
+
+    ``base`` holds land_price, land_lvr, soft_costs, interest_rate and units,
+    as for sensitivity.evaluate. The same seed and batch size reproduce the
+    same results. ``distributions`` defaults to default_distributions(base).
+    With a ``discount_rate``, equity IRR and equity NPV are summarised too.
+    """
+    if distributions is None:
+        distributions = default_distributions(base)
+    unknown = set(distributions) - set(SENSITIVITY_INPUTS)
+    if unknown:
+        raise ValueError(f"Unknown risk input(s): {', '.join(sorted(unknown))}")
+    rng = np.random.default_rng(seed)
+    outcomes = ("roi_cash", "roi_all", "peak_cash", "gross_profit")
+    if discount_rate is not None:
+        outcomes += ("equity_irr", "equity_npv")
+    hists = {k: StreamingHistogram() for k in outcomes}
+    grade_counts = dict.fromkeys(GRADES, 0)
+    losses = 0
+
+    for lo in range(0, n_sims, batch_size):
+        n = min(batch_size, n_sims - lo)
+        overrides = {name: draw(rng, spec, n) for name, spec in distributions.items()}
+        if "cont" in overrides:
+            overrides["cont"] = np.maximum(overrides["cont"], 0.0)
+        if "interest_rate" in overrides:
+            overrides["interest_rate"] = np.maximum(overrides["interest_rate"], 0.0)
+        result = evaluate(base, overrides, discount_rate)
+        for k, hist in hists.items():
+            hist.update(result[k])
+        grades, counts = np.unique(deal_grades(result["roi_cash"]), return_counts=True)
+        for g, c in zip(grades, counts):
+            grade_counts[str(g)] += int(c)
+        losses += int((result["gross_profit"] < 0).sum())
+
+    return {
+        "n_sims": n_sims,
+        "seed": seed,
+        "prob_loss": losses / n_sims if n_sims else float("nan"),
+        "grades": {g: c / n_sims for g, c in grade_counts.items()} if n_sims else grade_counts,
+        **{k: hist.summary() for k, hist in hists.items()},
+        "peak_cash_hist": hists["peak_cash"],
+    }
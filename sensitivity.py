@@ -0,0 +1,120 @@
+# Two-way sensitivity grids and one-at-a-time tornado ranking
+#
+# Global inputs (land_price, land_lvr, interest_rate) are swept as absolute
+# values. Per-unit inputs (rate, sale, cont, duration) are swept as scale
+# factors applied to every unit, so 1.0 is the project as entered.
+
+import numpy as np
+
+from feasibility import PROJECT_START, scenario_metrics, unit_arrays
+from returns import RETURN_METRICS, scenario_returns
+
+GLOBAL_INPUTS = ("land_price", "land_lvr", "interest_rate")
+UNIT_INPUTS = ("rate", "sale", "cont", "duration")
+SENSITIVITY_INPUTS = GLOBAL_INPUTS + UNIT_INPUTS
+SURFACE_METRICS = ("roi_cash", "peak_cash", "gross_profit")
+RETURN_SURFACE_METRICS = ("equity_irr", "project_irr", "equity_npv")  # need a discount rate
+
+# Scenarios evaluated per broadcast pass; bounds the (S, months) temporaries
+BLOCK_SIZE = 8192
+
+
+def default_values(base, name, n, swing=0.2):
+    """Evenly spaced sweep values ±swing around the base case."""
+    if name in UNIT_INPUTS:
+        return np.linspace(1 - swing, 1 + swing, n)
+    if name == "land_lvr":
+        return np.clip(np.linspace(base[name] - swing, base[name] + swing, n), 0.0, 1.0)
+    return np.linspace(base[name] * (1 - swing), base[name] * (1 + swing), n)
+
+
+def scenario_blocks(base, overrides, block_size=BLOCK_SIZE):
+    """Yield (slice, args, kwargs) engine inputs for successive scenario blocks.
+
+    ``base`` holds land_price, land_lvr, soft_costs, interest_rate and units,
+    plus optional repay_from_sales, accrual, start, drawdown and equity_first
+    settings. ``overrides`` maps input names to (S,) arrays. ``args``/``kwargs``
+    feed feasibility.scenario_metrics or ledger_flows for the block.
+    """
+    unknown = set(overrides) - set(SENSITIVITY_INPUTS)
+    if unknown:
+        raise ValueError(f"Unknown sensitivity input(s): {', '.join(sorted(unknown))}")
+    n_scen = len(next(iter(overrides.values()))) if overrides else 1
+    cols = unit_arrays(base["units"])
+    g = {k: np.broadcast_to(np.asarray(overrides.get(k, base[k]), dtype=float), (n_scen,)) for k in GLOBAL_INPUTS}
+
+    for lo in range(0, n_scen, block_size):
+        sl = slice(lo, min(lo + block_size, n_scen))
+        c = dict(cols)
+        for k in ("rate", "sale", "cont"):
+            if k in overrides:
+                c[k] = cols[k][None, :] * np.asarray(overrides[k])[sl, None]
+        if "duration" in overrides:
+            scaled = np.rint(cols["duration"][None, :] * np.asarray(overrides["duration"])[sl, None])
+            c["duration"] = np.maximum(scaled, 1).astype(np.int64)
+        kwargs = {
+            "interest_rate": g["interest_rate"][sl],
+            "repay_from_sales": base.get("repay_from_sales", True),
+            "accrual": base.get("accrual", "monthly"),
+            "start": base.get("start", PROJECT_START),
+            "drawdown": base.get("drawdown", "flat"),
+            "equity_first": base.get("equity_first"),
+        }
+        yield sl, (g["land_price"][sl], g["land_lvr"][sl], base["soft_costs"], c), kwargs
+
+
+def evaluate(base, overrides, discount_rate=None):
+    """Metrics for S scenarios given (S,) arrays of overridden inputs.
+
+    With a ``discount_rate`` (annual), RETURN_METRICS are included too.
+    """
+    out = {}
+    for sl, args, kwargs in scenario_blocks(base, overrides):
+        if discount_rate is None:
+            metrics = scenario_metrics(*args, **kwargs)
+        else:
+            metrics = scenario_returns(*args, discount_rate=discount_rate, **kwargs)
+        for k, v in metrics.items():
+            out.setdefault(k, []).append(np.broadcast_to(v, (sl.stop - sl.start,)))
+    return {k: np.concatenate(v) for k, v in out.items()}
+
+
+def sensitivity_grid(base, x_name, x_values, y_name, y_values, metrics=SURFACE_METRICS, discount_rate=None):
+    """Metric surfaces shaped (len(y_values), len(x_values)) for a two-way sweep.
+
+    Surfaces of RETURN_METRICS need a ``discount_rate``.
+    """
+    if x_name == y_name:
+        raise ValueError("Sensitivity axes must be two different inputs")
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    xx, yy = np.meshgrid(x_values, y_values)
+    if discount_rate is None and any(k in RETURN_METRICS for k in metrics):
+        raise ValueError("Return metric surfaces need a discount rate")
+    result = evaluate(base, {x_name: xx.ravel(), y_name: yy.ravel()}, discount_rate)
+    return {k: result[k].reshape(yy.shape) for k in metrics}
+
+
+def tornado(base, swing=0.1, metric="roi_cash", discount_rate=None):
+    """Rank every input by the metric swing from a ±swing one-at-a-time move.
+
+    Returns rows of (input, low, high, range) sorted largest range first.
+    """
+    overrides = {k: [] for k in SENSITIVITY_INPUTS}
+    for name in SENSITIVITY_INPUTS:
+        for factor in (1 - swing, 1 + swing):
+            for k in SENSITIVITY_INPUTS:
+                if k != name:
+                    overrides[k].append(1.0 if k in UNIT_INPUTS else base[k])
+                elif k in UNIT_INPUTS:
+                    overrides[k].append(factor)
+                elif k == "land_lvr":
+                    overrides[k].append(min(max(base[k] * factor, 0.0), 1.0))
+                else:
+                    overrides[k].append(base[k] * factor)
+    values = evaluate(base, overrides, discount_rate)[metric].reshape(-1, 2)
+    rows = [
+        {"input": name, "low": float(lo), "high": float(hi), "range": float(abs(hi - lo))}
+        for name, (lo, hi) in zip(SENSITIVITY_INPUTS, values)
+    ]
+    return sorted(rows, key=lambda r: r["range"], reverse=True)
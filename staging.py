@@ -0,0 +1,265 @@
+# Unit staging: choose build start months to cut peak cash or lift ROI
+#
+# Moving a unit only shifts its own draws, sale and build months, so a
+# candidate schedule is the current monthly draws, proceeds and active-build
+# counts plus a small signed scatter for the units it moves. Whole
+# neighbourhoods (every unit at every allowed start, and every swap of two
+# units' starts) are scattered onto (C, months) arrays and funded,
+# capitalised and scored in one batched pass. A best-improvement local
+# search then walks from the entered schedule until no move helps, and is
+# restarted from random kicks of a few units to escape local optima.
+#
+# Constraints are an earliest (and latest) start per unit, a maximum number
+# of units building in any month and an equity cap on peak cash. Infeasible
+# schedules are ranked by how far they break the constraints, so a search
+# that starts outside them first moves towards feasibility.
+
+import time
+
+import numpy as np
+
+from feasibility import (
+    PROJECT_START, assemble_flows, build_draws, construction_cost, flow_metrics, unit_arrays,
+)
+
+STAGING_OBJECTIVES = ("peak_cash", "roi_cash")
+CANDIDATE_CELLS = 500_000  # candidate-months per batched pass; bounds the (C, months) temporaries
+
+
+class _Schedule:
+    """Current starts with their monthly draws, proceeds and active-build counts."""
+
+    def __init__(self, cols, starts, n_months, drawdown):
+        self.cols = cols
+        self.n_months = n_months
+        duration = cols["duration"]
+        # Each unit's draw shape from a start of 0, stored as flat runs
+        _, self.offsets, self.amounts = build_draws(
+            construction_cost(cols), np.zeros_like(duration), duration, drawdown,
+        )
+        self.ptr = np.r_[0, np.cumsum(duration)]
+        self.starts = np.asarray(starts, dtype=np.int64).copy()
+        self.draws = np.zeros(n_months)
+        self.proceeds = np.zeros(n_months)
+        self.active = np.zeros(n_months)
+        self._scatter(np.arange(len(duration)), self.starts, +1, self.draws, self.proceeds, self.active)
+
+    def _runs(self, units):
+        """(run index, entry index) of every build month of ``units``."""
+        lengths = self.cols["duration"][units]
+        run = np.repeat(np.arange(len(units)), lengths)
+        entry = self.ptr[units][run] + np.arange(run.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return run, entry
+
+    def _scatter(self, units, starts, sign, draws, proceeds, active):
+        run, entry = self._runs(units)
+        months = starts[run] + self.offsets[entry]
+        draws += sign * np.bincount(months, weights=self.amounts[entry], minlength=self.n_months)
+        active += sign * np.bincount(months, minlength=self.n_months)
+        sales = starts + self.cols["duration"][units] + 1
+        proceeds += sign * np.bincount(sales, weights=self.cols["sale"][units], minlength=self.n_months)
+
+    def move(self, units, starts):
+        self._scatter(units, self.starts[units], -1, self.draws, self.proceeds, self.active)
+        self.starts[units] = starts
+        self._scatter(units, self.starts[units], +1, self.draws, self.proceeds, self.active)
+
+    def candidates(self, cand, units, starts):
+        """(draws, proceeds, active, starts) for C candidates, each moving some units.
+
+        ``cand``, ``units`` and ``starts`` list the moves: candidate ``cand[k]``
+        puts unit ``units[k]`` at ``starts[k]``.
+        """
+        n_cand = int(cand.max()) + 1
+        n = self.n_months
+        run, entry = self._runs(units)
+        row = cand[run] * n
+        old = row + self.starts[units][run] + self.offsets[entry]
+        new = row + starts[run] + self.offsets[entry]
+        idx = np.concatenate([old, new])
+        sign = np.repeat([-1.0, 1.0], run.size)
+        draws = self.draws + np.bincount(idx, weights=sign * np.tile(self.amounts[entry], 2), minlength=n_cand * n
+                                         ).reshape(n_cand, n)
+        active = self.active + np.bincount(idx, weights=sign, minlength=n_cand * n).reshape(n_cand, n)
+
+        duration = self.cols["duration"][units]
+        sale = self.cols["sale"][units]
+        sale_idx = np.concatenate([cand * n + self.starts[units] + duration + 1, cand * n + starts + duration + 1])
+        proceeds = self.proceeds + np.bincount(
+            sale_idx, weights=np.concatenate([-sale, sale]), minlength=n_cand * n,
+        ).reshape(n_cand, n)
+
+        cand_starts = np.broadcast_to(self.starts, (n_cand, len(self.starts))).copy()
+        cand_starts[cand, units] = starts
+        return draws, proceeds, active, cand_starts
+
+
+def _score(schedule, draws, proceeds, active, starts, base, objective, max_concurrent, equity_cap):
+    """(violation, objective to minimise, metrics) for candidate rows."""
+    cols = schedule.cols
+    flows = assemble_flows(
+        draws, proceeds, base["land_price"], base["land_lvr"], base["soft_costs"],
+        interest_rate=base.get("interest_rate", 0.0), repay_from_sales=base.get("repay_from_sales", True),
+        accrual=base.get("accrual", "monthly"), start=base.get("start", PROJECT_START),
+        equity_first=base.get("equity_first"),
+    )
+    sales = starts + cols["duration"] + 1
+    # Each schedule's own ledger ends the month after its last sale; later interest is not its cost
+    months = np.arange(schedule.n_months)
+    flows["interest"] = np.where(months <= sales.max(axis=1)[:, None] + 1, flows["interest"], 0.0)
+    n_cand = len(draws)
+    metrics = flow_metrics(
+        flows, sales.min(axis=1), np.full(n_cand, cols["sale"].sum()), np.full(n_cand, construction_cost(cols).sum()),
+        base["land_price"], base["soft_costs"],
+    )
+    metrics["max_concurrent"] = active.max(axis=1)
+    violation = np.zeros(n_cand)
+    if max_concurrent is not None:
+        violation += np.maximum(metrics["max_concurrent"] - max_concurrent, 0) / max(max_concurrent, 1)
+    if equity_cap is not None:
+        violation += np.maximum(metrics["peak_cash"] - equity_cap, 0) / max(equity_cap, 1.0)
+    value = metrics["peak_cash"] if objective == "peak_cash" else -np.nan_to_num(metrics["roi_cash"], nan=-np.inf)
+    return violation, value, metrics
+
+
+def _neighbourhood(starts, earliest, latest):
+    """Moves for every single-unit restart and every two-unit start swap."""
+    n_units = len(starts)
+    width = latest - earliest + 1
+    units = np.repeat(np.arange(n_units), width)
+    new = earliest[units] + np.arange(units.size) - np.repeat(np.cumsum(width) - width, width)
+    keep = new != starts[units]
+    units, new = units[keep], new[keep]
+    cand = np.arange(units.size)
+
+    a, b = np.triu_indices(n_units, 1)
+    ok = (starts[a] != starts[b]) & (starts[b] >= earliest[a]) & (starts[b] <= latest[a]) \
+        & (starts[a] >= earliest[b]) & (starts[a] <= latest[b])
+    a, b = a[ok], b[ok]
+    swap = units.size + np.arange(a.size)
+    return (
+        np.concatenate([cand, swap, swap]),
+        np.concatenate([units, a, b]),
+        np.concatenate([new, starts[b], starts[a]]),
+    )
+
+
+def _improves(candidate, current):
+    """Whether (violation, value) ``candidate`` beats ``current``."""
+    return candidate[0] < current[0] - 1e-12 or (
+        candidate[0] <= current[0] + 1e-12 and candidate[1] < current[1] - 1e-9 * max(abs(current[1]), 1.0)
+    )
+
+
+def _descend(schedule, current, earliest, latest, base, limits, max_rounds, deadline):
+    """Best-improvement moves from ``current`` until none helps; returns (score, rounds, evaluations)."""
+    rounds = evaluations = 0
+    per_pass = max(CANDIDATE_CELLS // schedule.n_months, 1)
+    while rounds < max_rounds and time.perf_counter() < deadline:
+        cand, units, starts = _neighbourhood(schedule.starts, earliest, latest)
+        if not cand.size:
+            break
+        best = None
+        for lo in range(0, int(cand.max()) + 1, per_pass):
+            if best is not None and time.perf_counter() >= deadline:
+                break  # out of time: take the best move among the chunks scored so far
+            sel = (cand >= lo) & (cand < lo + per_pass)
+            violation, value, _ = _score(
+                schedule, *schedule.candidates(cand[sel] - lo, units[sel], starts[sel]), base, *limits,
+            )
+            i = np.lexsort((value, violation))[0]
+            if best is None or (violation[i], value[i]) < best[:2]:
+                best = (violation[i], value[i], lo + i)
+            evaluations += len(value)
+        if not _improves(best[:2], current):
+            break
+        moved = cand == best[2]
+        schedule.move(units[moved], starts[moved])
+        current = best[:2]
+        rounds += 1
+    return current, rounds, evaluations
+
+
+def _current(schedule, base, limits):
+    # A no-op move scores the schedule as it stands with the same kernel
+    return _score(schedule, *schedule.candidates(np.zeros(1, np.int64), np.zeros(1, np.int64),
+                                                 schedule.starts[:1]), base, *limits)
+
+
+def optimise_staging(base, objective="peak_cash", earliest=0, latest=None, max_concurrent=None, equity_cap=None,
+                     max_rounds=500, restarts=20, time_budget=None, seed=0):
+    """Start months for ``base["units"]`` that minimise peak cash or maximise cash-on-cash ROI.
+
+    ``base`` is as for sensitivity.evaluate (land_price, land_lvr,
+    soft_costs, interest_rate, units and optional repay_from_sales, accrual,
+    start, drawdown and equity_first). ``earliest``/``latest`` bound each
+    unit's start (scalars or per unit); ``latest`` defaults to leaving room to
+    build every unit one after another.
+
+    The search is a heuristic: each descent stops at a local optimum, where
+    no single restart or swap helps. Up to ``restarts`` times it then moves a
+    few random units (seeded by ``seed``) and descends again, keeping the
+    best schedule found, so the result is the best local optimum seen, not a
+    proven optimum. ``max_rounds`` caps the moves per descent and
+    ``time_budget`` (seconds) the whole search; it is checked between
+    candidate chunks, so it overruns by at most one chunk. Returns a dict
+    with the chosen ``starts``, the ``initial`` and final metrics, whether the
+    final schedule is ``feasible``, and the number of ``rounds``,
+    ``restarts`` and ``evaluations``.
+    """
+    if objective not in STAGING_OBJECTIVES:
+        raise ValueError(f"Unknown staging objective '{objective}'; expected one of {STAGING_OBJECTIVES}")
+    deadline = time.perf_counter() + time_budget if time_budget is not None else np.inf
+    cols = unit_arrays(base["units"])
+    n_units = len(cols["start"])
+    if not n_units:
+        raise ValueError("At least one unit is required")
+    earliest = np.broadcast_to(np.asarray(earliest, dtype=np.int64), (n_units,))
+    if (earliest < 0).any():
+        raise ValueError("Earliest start must not be before month 0")
+    if latest is None:
+        latest = earliest.max() + cols["duration"].sum()
+    latest = np.broadcast_to(np.asarray(latest, dtype=np.int64), (n_units,))
+    if (latest < earliest).any():
+        raise ValueError("Latest start must not be before the earliest start")
+
+    n_months = int((latest + cols["duration"]).max()) + 2
+    schedule = _Schedule(cols, np.clip(cols["start"], earliest, latest), n_months, base.get("drawdown", "flat"))
+    limits = (objective, max_concurrent, equity_cap)
+
+    initial = _current(schedule, base, limits)
+    best, rounds, evaluations = _descend(
+        schedule, (initial[0][0], initial[1][0]), earliest, latest, base, limits, max_rounds, deadline,
+    )
+    evaluations += 1
+    best_starts = schedule.starts.copy()
+
+    # Iterated local search: kick a few units to random starts and descend again
+    rng = np.random.default_rng(seed)
+    kick = min(n_units, max(2, n_units // 5))
+    done = 0
+    while done < restarts and time.perf_counter() < deadline:
+        units = rng.choice(n_units, kick, replace=False)
+        schedule.move(units, rng.integers(earliest[units], latest[units] + 1))
+        kicked = _current(schedule, base, limits)
+        score, moves, evals = _descend(
+            schedule, (kicked[0][0], kicked[1][0]), earliest, latest, base, limits, max_rounds, deadline,
+        )
+        rounds += moves
+        evaluations += evals + 1
+        done += 1
+        if _improves(score, best):
+            best, best_starts = score, schedule.starts.copy()
+        else:
+            schedule.move(np.arange(n_units), best_starts)
+
+    final = _current(schedule, base, limits)
+    return {
+        "starts": schedule.starts.copy(),
+        "initial": {k: float(v[0]) for k, v in initial[2].items()},
+        "metrics": {k: float(v[0]) for k, v in final[2].items()},
+        "feasible": bool(final[0][0] == 0),
+        "rounds": rounds,
+        "restarts": done,
+        "evaluations": evaluations,
+    }
@@ -0,0 +1,125 @@
+# Struct-of-arrays unit table
+#
+# One typed NumPy column per unit field instead of a list of dicts, so a
+# 1,000-lot estate is seven arrays. The engine reads the columns directly
+# (feasibility.unit_arrays), edits are applied in batches, and iterating
+# still yields plain unit dicts for code that expects the list form.
+
+import numpy as np
+
+from feasibility import UNIT_COLUMNS, UNIT_FIELDS
+
+UNIT_DTYPES = {
+    "label": object, "size": float, "rate": float, "cont": float,
+    "start": np.int64, "duration": np.int64, "sale": float,
+}
+
+
+def _column(name, values):
+    if UNIT_DTYPES[name] is np.int64:
+        values = np.asarray(values, dtype=float)
+        if np.isnan(values).any() or (values != np.round(values)).any():
+            raise ValueError(f"Unit '{name}' must be a whole number of months")
+        return values.astype(np.int64)
+    column = np.array(values, dtype=UNIT_DTYPES[name])
+    if column.dtype == float and np.isnan(column).any():
+        raise ValueError(f"Unit '{name}' has blank values")
+    return column
+
+
+class UnitTable:
+    """Units as one typed array per field (label, size, rate, cont, start, duration, sale)."""
+
+    def __init__(self, columns=None):
+        if columns is None:
+            columns = {k: () for k in UNIT_FIELDS}
+        missing = [k for k in UNIT_FIELDS if k not in columns]
+        if missing:
+            raise ValueError(f"Units are missing column(s): {', '.join(missing)}")
+        self.columns = {k: _column(k, columns[k]) for k in UNIT_FIELDS}
+        if len({len(v) for v in self.columns.values()}) > 1:
+            raise ValueError("Unit columns have different lengths")
+
+    @classmethod
+    def from_records(cls, units):
+        """Table from a list of unit dicts (or a copy of another table)."""
+        if isinstance(units, UnitTable):
+            return units.take(slice(None))
+        units = list(units)
+        return cls({k: [u.get(k) for u in units] for k in UNIT_FIELDS})
+
+    @classmethod
+    def from_csv(cls, source):
+        """Table from a CSV path or file object with UNIT_FIELDS columns.
+
+        ``label`` is optional and defaults to "Unit 1", "Unit 2", ...
+        """
+        import pandas as pd
+
+        df = pd.read_csv(source)
+        if "label" not in df.columns:
+            df["label"] = [f"Unit {i + 1}" for i in range(len(df))]
+        return cls({k: df[k].to_numpy() for k in UNIT_FIELDS if k in df.columns})
+
+    def __len__(self):
+        return len(self.columns["size"])
+
+    def __getitem__(self, index):
+        return {k: v[index].item() if k != "label" else v[index] for k, v in self.columns.items()}
+
+    def __iter__(self):
+        return iter(self.records())
+
+    def records(self):
+        """Units as a list of plain dicts (Python scalars, JSON-ready)."""
+        values = [self.columns[k].tolist() for k in UNIT_FIELDS]
+        return [dict(zip(UNIT_FIELDS, row)) for row in zip(*values)]
+
+    def arrays(self):
+        """Engine columns (UNIT_COLUMNS), as returned by feasibility.unit_arrays."""
+        if (self.columns["duration"] <= 0).any():
+            raise ValueError("Unit build duration must be at least 1 month")
+        if (self.columns["start"] < 0).any():
+            raise ValueError("Unit start month must not be before month 0")
+        return {k: self.columns[k] for k in UNIT_COLUMNS}
+
+    def take(self, index):
+        """New table holding the rows at ``index`` (indices, mask or slice)."""
+        return UnitTable({k: v[index] for k, v in self.columns.items()})
+
+    def append(self, units):
+        other = UnitTable.from_records(units)
+        self.columns = {k: np.concatenate([v, other.columns[k]]) for k, v in self.columns.items()}
+        return other
+
+    def remove(self, indices):
+        """Delete rows in one pass; returns the removed rows as a table."""
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        removed = self.take(indices)
+        self.columns = {k: np.delete(v, indices) for k, v in self.columns.items()}
+        return removed
+
+    def update(self, indices, changes):
+        """Set ``changes`` ({field: values}) on the rows at ``indices``.
+
+        Every changed column is validated before any is written, so a bad
+        edit leaves the table untouched.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        updated = {}
+        for k, values in changes.items():
+            column = self.columns[k].copy()
+            column[indices] = _column(k, np.broadcast_to(values, indices.shape))
+            updated[k] = column
+        if "duration" in updated and (updated["duration"][indices] <= 0).any():
+            raise ValueError("Unit build duration must be at least 1 month")
+        if "start" in updated and (updated["start"][indices] < 0).any():
+            raise ValueError("Unit start month must not be before month 0")
+        self.columns.update(updated)
+
+    def frame(self, lo=0, hi=None):
+        """Rows lo:hi as a DataFrame indexed by unit position."""
+        import pandas as pd
+
+        hi = len(self) if hi is None else min(hi, len(self))
+        return pd.DataFrame({k: v[lo:hi] for k, v in self.columns.items()}, index=pd.RangeIndex(lo, hi))